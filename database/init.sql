@@ -3,8 +3,11 @@ CREATE TABLE proveedores (
   nombre TEXT UNIQUE NOT NULL
 );
 
+-- Cada chat de Telegram (chat_id) es un tenant: sus facturas y reportes son independientes.
+-- proveedores es un catálogo compartido; los datos de cada hogar viven en facturas.
 CREATE TABLE facturas (
   id SERIAL PRIMARY KEY,
+  chat_id BIGINT NOT NULL,
   proveedor_id INT REFERENCES proveedores(id),
   numero TEXT,
   fecha DATE,
@@ -12,9 +15,20 @@ CREATE TABLE facturas (
   total NUMERIC(14,2),
   categoria VARCHAR(100),
   raw_json JSONB,
+  huella CHAR(64),
+  archivo_hash CHAR(64),
   created_at TIMESTAMP DEFAULT NOW()
 );
 
+-- Deduplicación por tenant: huella = sha256(proveedor normalizado | fecha | total),
+-- archivo_hash = sha256 de los bytes del archivo subido
+CREATE UNIQUE INDEX facturas_huella_key ON facturas (chat_id, huella);
+CREATE UNIQUE INDEX facturas_archivo_hash_key ON facturas (chat_id, archivo_hash);
+
+-- Consultas por rango de fechas de un tenant: INCLUDE (total) permite index-only scans
+CREATE INDEX facturas_fecha_categoria_idx ON facturas (chat_id, fecha, categoria) INCLUDE (total);
+CREATE INDEX facturas_proveedor_fecha_idx ON facturas (chat_id, proveedor_id, fecha);
+
 CREATE TABLE marcas (
   id SERIAL PRIMARY KEY,
   nombre TEXT UNIQUE NOT NULL
@@ -36,14 +50,104 @@ CREATE TABLE items (
   precio_total NUMERIC(14,2)
 );
 
+-- Gasto mensual acumulado por (chat, mes, categoría, proveedor), mantenido por trigger.
+-- mes = primer día del mes; NULL agrupa las facturas sin fecha.
+CREATE TABLE gastos_mensuales (
+  chat_id BIGINT NOT NULL,
+  mes DATE,
+  categoria VARCHAR(100),
+  proveedor_id INT REFERENCES proveedores(id),
+  cantidad INT NOT NULL DEFAULT 0,
+  total NUMERIC(14,2) NOT NULL DEFAULT 0,
+  CONSTRAINT gastos_mensuales_key UNIQUE NULLS NOT DISTINCT (chat_id, mes, categoria, proveedor_id)
+);
+
+CREATE FUNCTION gastos_mensuales_sumar(p_chat_id BIGINT, p_mes DATE, p_categoria VARCHAR,
+                                       p_proveedor_id INT, p_cantidad INT, p_total NUMERIC)
+RETURNS void AS $$
+BEGIN
+  INSERT INTO gastos_mensuales (chat_id, mes, categoria, proveedor_id, cantidad, total)
+  VALUES (p_chat_id, p_mes, p_categoria, p_proveedor_id, p_cantidad, COALESCE(p_total, 0))
+  ON CONFLICT ON CONSTRAINT gastos_mensuales_key DO UPDATE
+    SET cantidad = gastos_mensuales.cantidad + EXCLUDED.cantidad,
+        total = gastos_mensuales.total + EXCLUDED.total;
+
+  IF p_cantidad < 0 THEN
+    DELETE FROM gastos_mensuales
+    WHERE cantidad <= 0
+      AND chat_id = p_chat_id
+      AND mes IS NOT DISTINCT FROM p_mes
+      AND categoria IS NOT DISTINCT FROM p_categoria
+      AND proveedor_id IS NOT DISTINCT FROM p_proveedor_id;
+  END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION gastos_mensuales_trigger()
+RETURNS trigger AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    PERFORM gastos_mensuales_sumar(OLD.chat_id, date_trunc('month', OLD.fecha)::date,
+                                   OLD.categoria, OLD.proveedor_id, -1, -OLD.total);
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    PERFORM gastos_mensuales_sumar(NEW.chat_id, date_trunc('month', NEW.fecha)::date,
+                                   NEW.categoria, NEW.proveedor_id, 1, NEW.total);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER facturas_gastos_mensuales
+AFTER INSERT OR DELETE OR UPDATE OF chat_id, fecha, categoria, proveedor_id, total ON facturas
+FOR EACH ROW EXECUTE FUNCTION gastos_mensuales_trigger();
+
+-- Recalcula gastos_mensuales desde cero (carga inicial o reparación).
+CREATE FUNCTION recalcular_gastos_mensuales()
+RETURNS void AS $$
+BEGIN
+  -- bloquea escrituras en facturas mientras se reconstruye
+  LOCK TABLE facturas IN SHARE MODE;
+  DELETE FROM gastos_mensuales;
+  INSERT INTO gastos_mensuales (chat_id, mes, categoria, proveedor_id, cantidad, total)
+  SELECT chat_id, date_trunc('month', fecha)::date, categoria, proveedor_id, COUNT(*),
+         COALESCE(SUM(total), 0)
+  FROM facturas
+  GROUP BY 1, 2, 3, 4;
+END;
+$$ LANGUAGE plpgsql;
+
 CREATE VIEW v_resumen AS
 SELECT
-  date_trunc('month', f.fecha) AS mes,
-  SUM(i.precio_total) AS gasto_mes
-FROM facturas f
-JOIN items i ON i.factura_id = f.id
-GROUP BY 1
-ORDER BY 1 DESC;
+  chat_id,
+  mes,
+  SUM(total) AS gasto_mes
+FROM gastos_mensuales
+WHERE mes IS NOT NULL
+GROUP BY 1, 2
+ORDER BY 1, 2 DESC;
+
+-- Cola de ingesta: los archivos recibidos por el bot se procesan en segundo plano.
+-- estado: pendiente -> procesando -> ok | error
+CREATE TABLE trabajos_ingesta (
+  id BIGSERIAL PRIMARY KEY,
+  chat_id BIGINT NOT NULL,
+  mensaje_id BIGINT,                -- acuse de recibo que se edita con el resultado
+  nombre_archivo TEXT NOT NULL,
+  mime_type TEXT NOT NULL,
+  contenido BYTEA,                  -- se borra al terminar
+  estado VARCHAR(20) NOT NULL DEFAULT 'pendiente',
+  intentos INT NOT NULL DEFAULT 0,
+  resultado TEXT,
+  disponible_desde TIMESTAMP NOT NULL DEFAULT NOW(),
+  creado TIMESTAMP NOT NULL DEFAULT NOW(),
+  actualizado TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX trabajos_ingesta_pendientes_idx ON trabajos_ingesta (creado)
+  WHERE estado IN ('pendiente', 'procesando');
+CREATE INDEX trabajos_ingesta_en_curso_idx ON trabajos_ingesta (chat_id)
+  WHERE estado = 'procesando';
 
 -- Logs de OCR (texto completo para análisis o debug)
 CREATE TABLE IF NOT EXISTS logs_ocr (
@@ -52,7 +156,32 @@ CREATE TABLE IF NOT EXISTS logs_ocr (
     proveedor_detectado VARCHAR(100),
     fecha TIMESTAMP DEFAULT NOW(),
     texto_ocr TEXT,
-    fuente VARCHAR(50) DEFAULT 'ocr_ia'
+    fuente VARCHAR(50) DEFAULT 'ocr_ia',
+    chat_id BIGINT,                 -- chat de Telegram, igual que facturas.chat_id
+    archivo_hash CHAR(64),          -- sha256 del archivo, igual que facturas.archivo_hash
+    nombre_archivo TEXT,
+    tipo_documento VARCHAR(20),
+    texto_capa TEXT,                -- capa de texto del PDF (sin OCR)
+    tiempos JSONB,                  -- extraccion_ms, modelo_ms, total_ms
+    resultado JSONB,
+    prompt_version VARCHAR(16)
 );
 
+CREATE INDEX logs_ocr_archivo_hash_idx ON logs_ocr (archivo_hash, fecha DESC);
+CREATE INDEX logs_ocr_chat_archivo_idx ON logs_ocr (chat_id, archivo_hash, fecha DESC);
+
+-- el servicio registra el texto antes de que el bot guarde la factura: se vincula al insertarla
+CREATE FUNCTION logs_ocr_vincular_factura()
+RETURNS trigger AS $$
+BEGIN
+  UPDATE logs_ocr SET factura_id = NEW.id
+  WHERE chat_id = NEW.chat_id AND archivo_hash = NEW.archivo_hash AND factura_id IS NULL;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER facturas_logs_ocr
+AFTER INSERT ON facturas
+FOR EACH ROW WHEN (NEW.archivo_hash IS NOT NULL) EXECUTE FUNCTION logs_ocr_vincular_factura();
+
 
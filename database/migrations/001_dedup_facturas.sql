@@ -0,0 +1,38 @@
+-- Huella de contenido y hash de archivo para detectar facturas duplicadas.
+-- Para bases creadas antes de este cambio:
+--   docker exec -i db_facturas psql -U $DB_USER -d $DB_NAME < database/migrations/001_dedup_facturas.sql
+
+BEGIN;
+
+ALTER TABLE facturas ADD COLUMN IF NOT EXISTS huella CHAR(64);
+ALTER TABLE facturas ADD COLUMN IF NOT EXISTS archivo_hash CHAR(64);
+
+-- misma normalización que dedup.huella_factura(); si ya hay duplicados,
+-- solo la primera factura de cada grupo se queda con la huella
+WITH calculadas AS (
+  SELECT
+    f.id,
+    encode(sha256(convert_to(
+      lower(trim(regexp_replace(p.nombre, '\s+', ' ', 'g')))
+      || '|' || COALESCE(to_char(f.fecha, 'YYYY-MM-DD'), '')
+      || '|' || to_char(COALESCE(f.total, 0), 'FM999999999990.00'),
+      'UTF8')), 'hex') AS huella
+  FROM facturas f
+  JOIN proveedores p ON p.id = f.proveedor_id
+  WHERE f.huella IS NULL
+),
+numeradas AS (
+  SELECT id, huella, ROW_NUMBER() OVER (PARTITION BY huella ORDER BY id) AS n
+  FROM calculadas
+)
+UPDATE facturas f
+SET huella = numeradas.huella
+FROM numeradas
+WHERE f.id = numeradas.id
+  AND numeradas.n = 1
+  AND NOT EXISTS (SELECT 1 FROM facturas o WHERE o.huella = numeradas.huella);
+
+CREATE UNIQUE INDEX IF NOT EXISTS facturas_huella_key ON facturas (huella);
+CREATE UNIQUE INDEX IF NOT EXISTS facturas_archivo_hash_key ON facturas (archivo_hash);
+
+COMMIT;
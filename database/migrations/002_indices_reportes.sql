@@ -0,0 +1,11 @@
+-- Índices para los reportes por rango de fechas (/resumen, /resumen_general, /comparar).
+-- CONCURRENTLY no bloquea las escrituras mientras se construyen (no puede ir dentro de BEGIN).
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS facturas_fecha_categoria_idx
+  ON facturas (fecha, categoria) INCLUDE (total);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS facturas_proveedor_fecha_idx
+  ON facturas (proveedor_id, fecha);
+
+-- estadísticas y visibility map al día para que el planner elija index-only scans
+VACUUM ANALYZE facturas;
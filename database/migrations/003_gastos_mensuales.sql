@@ -0,0 +1,81 @@
+-- Tabla de gasto mensual acumulado (gastos_mensuales) con trigger y carga inicial.
+
+BEGIN;
+
+-- Gasto mensual acumulado por (mes, categoría, proveedor), mantenido por trigger.
+-- mes = primer día del mes; NULL agrupa las facturas sin fecha.
+CREATE TABLE IF NOT EXISTS gastos_mensuales (
+  mes DATE,
+  categoria VARCHAR(100),
+  proveedor_id INT REFERENCES proveedores(id),
+  cantidad INT NOT NULL DEFAULT 0,
+  total NUMERIC(14,2) NOT NULL DEFAULT 0,
+  CONSTRAINT gastos_mensuales_key UNIQUE NULLS NOT DISTINCT (mes, categoria, proveedor_id)
+);
+
+CREATE OR REPLACE FUNCTION gastos_mensuales_sumar(p_mes DATE, p_categoria VARCHAR, p_proveedor_id INT,
+                                                  p_cantidad INT, p_total NUMERIC)
+RETURNS void AS $$
+BEGIN
+  INSERT INTO gastos_mensuales (mes, categoria, proveedor_id, cantidad, total)
+  VALUES (p_mes, p_categoria, p_proveedor_id, p_cantidad, COALESCE(p_total, 0))
+  ON CONFLICT ON CONSTRAINT gastos_mensuales_key DO UPDATE
+    SET cantidad = gastos_mensuales.cantidad + EXCLUDED.cantidad,
+        total = gastos_mensuales.total + EXCLUDED.total;
+
+  IF p_cantidad < 0 THEN
+    DELETE FROM gastos_mensuales
+    WHERE cantidad <= 0
+      AND mes IS NOT DISTINCT FROM p_mes
+      AND categoria IS NOT DISTINCT FROM p_categoria
+      AND proveedor_id IS NOT DISTINCT FROM p_proveedor_id;
+  END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION gastos_mensuales_trigger()
+RETURNS trigger AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    PERFORM gastos_mensuales_sumar(date_trunc('month', OLD.fecha)::date, OLD.categoria,
+                                   OLD.proveedor_id, -1, -OLD.total);
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    PERFORM gastos_mensuales_sumar(date_trunc('month', NEW.fecha)::date, NEW.categoria,
+                                   NEW.proveedor_id, 1, NEW.total);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER facturas_gastos_mensuales
+AFTER INSERT OR DELETE OR UPDATE OF fecha, categoria, proveedor_id, total ON facturas
+FOR EACH ROW EXECUTE FUNCTION gastos_mensuales_trigger();
+
+-- Recalcula gastos_mensuales desde cero (carga inicial o reparación).
+CREATE OR REPLACE FUNCTION recalcular_gastos_mensuales()
+RETURNS void AS $$
+BEGIN
+  -- bloquea escrituras en facturas mientras se reconstruye
+  LOCK TABLE facturas IN SHARE MODE;
+  DELETE FROM gastos_mensuales;
+  INSERT INTO gastos_mensuales (mes, categoria, proveedor_id, cantidad, total)
+  SELECT date_trunc('month', fecha)::date, categoria, proveedor_id, COUNT(*), COALESCE(SUM(total), 0)
+  FROM facturas
+  GROUP BY 1, 2, 3;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP VIEW IF EXISTS v_resumen;
+CREATE VIEW v_resumen AS
+SELECT
+  mes,
+  SUM(total) AS gasto_mes
+FROM gastos_mensuales
+WHERE mes IS NOT NULL
+GROUP BY 1
+ORDER BY 1 DESC;
+
+SELECT recalcular_gastos_mensuales();
+
+COMMIT;
@@ -0,0 +1,114 @@
+-- Multi-tenant: cada chat de Telegram ve solo sus facturas.
+-- Las facturas existentes se asignan al chat indicado con -v chat_id:
+--   docker exec -i db_facturas psql -U $DB_USER -d $DB_NAME -v chat_id=<id> < database/migrations/004_tenant_chat_id.sql
+
+\if :{?chat_id}
+\else
+  \echo 'Falta -v chat_id=<id>: chat de Telegram dueño de las facturas existentes'
+  \quit
+\endif
+
+BEGIN;
+
+ALTER TABLE facturas ADD COLUMN IF NOT EXISTS chat_id BIGINT;
+UPDATE facturas SET chat_id = :chat_id WHERE chat_id IS NULL;
+ALTER TABLE facturas ALTER COLUMN chat_id SET NOT NULL;
+
+-- deduplicación e índices de reportes con el tenant como primera columna
+DROP INDEX IF EXISTS facturas_huella_key;
+DROP INDEX IF EXISTS facturas_archivo_hash_key;
+DROP INDEX IF EXISTS facturas_fecha_categoria_idx;
+DROP INDEX IF EXISTS facturas_proveedor_fecha_idx;
+CREATE UNIQUE INDEX facturas_huella_key ON facturas (chat_id, huella);
+CREATE UNIQUE INDEX facturas_archivo_hash_key ON facturas (chat_id, archivo_hash);
+CREATE INDEX facturas_fecha_categoria_idx ON facturas (chat_id, fecha, categoria) INCLUDE (total);
+CREATE INDEX facturas_proveedor_fecha_idx ON facturas (chat_id, proveedor_id, fecha);
+
+-- gastos_mensuales se recrea con chat_id
+DROP VIEW IF EXISTS v_resumen;
+DROP TRIGGER IF EXISTS facturas_gastos_mensuales ON facturas;
+DROP FUNCTION IF EXISTS gastos_mensuales_trigger();
+DROP FUNCTION IF EXISTS gastos_mensuales_sumar(DATE, VARCHAR, INT, INT, NUMERIC);
+DROP FUNCTION IF EXISTS recalcular_gastos_mensuales();
+DROP TABLE IF EXISTS gastos_mensuales;
+
+-- Gasto mensual acumulado por (chat, mes, categoría, proveedor), mantenido por trigger.
+-- mes = primer día del mes; NULL agrupa las facturas sin fecha.
+CREATE TABLE gastos_mensuales (
+  chat_id BIGINT NOT NULL,
+  mes DATE,
+  categoria VARCHAR(100),
+  proveedor_id INT REFERENCES proveedores(id),
+  cantidad INT NOT NULL DEFAULT 0,
+  total NUMERIC(14,2) NOT NULL DEFAULT 0,
+  CONSTRAINT gastos_mensuales_key UNIQUE NULLS NOT DISTINCT (chat_id, mes, categoria, proveedor_id)
+);
+
+CREATE FUNCTION gastos_mensuales_sumar(p_chat_id BIGINT, p_mes DATE, p_categoria VARCHAR,
+                                       p_proveedor_id INT, p_cantidad INT, p_total NUMERIC)
+RETURNS void AS $$
+BEGIN
+  INSERT INTO gastos_mensuales (chat_id, mes, categoria, proveedor_id, cantidad, total)
+  VALUES (p_chat_id, p_mes, p_categoria, p_proveedor_id, p_cantidad, COALESCE(p_total, 0))
+  ON CONFLICT ON CONSTRAINT gastos_mensuales_key DO UPDATE
+    SET cantidad = gastos_mensuales.cantidad + EXCLUDED.cantidad,
+        total = gastos_mensuales.total + EXCLUDED.total;
+
+  IF p_cantidad < 0 THEN
+    DELETE FROM gastos_mensuales
+    WHERE cantidad <= 0
+      AND chat_id = p_chat_id
+      AND mes IS NOT DISTINCT FROM p_mes
+      AND categoria IS NOT DISTINCT FROM p_categoria
+      AND proveedor_id IS NOT DISTINCT FROM p_proveedor_id;
+  END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION gastos_mensuales_trigger()
+RETURNS trigger AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    PERFORM gastos_mensuales_sumar(OLD.chat_id, date_trunc('month', OLD.fecha)::date,
+                                   OLD.categoria, OLD.proveedor_id, -1, -OLD.total);
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    PERFORM gastos_mensuales_sumar(NEW.chat_id, date_trunc('month', NEW.fecha)::date,
+                                   NEW.categoria, NEW.proveedor_id, 1, NEW.total);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER facturas_gastos_mensuales
+AFTER INSERT OR DELETE OR UPDATE OF chat_id, fecha, categoria, proveedor_id, total ON facturas
+FOR EACH ROW EXECUTE FUNCTION gastos_mensuales_trigger();
+
+-- Recalcula gastos_mensuales desde cero (carga inicial o reparación).
+CREATE FUNCTION recalcular_gastos_mensuales()
+RETURNS void AS $$
+BEGIN
+  -- bloquea escrituras en facturas mientras se reconstruye
+  LOCK TABLE facturas IN SHARE MODE;
+  DELETE FROM gastos_mensuales;
+  INSERT INTO gastos_mensuales (chat_id, mes, categoria, proveedor_id, cantidad, total)
+  SELECT chat_id, date_trunc('month', fecha)::date, categoria, proveedor_id, COUNT(*),
+         COALESCE(SUM(total), 0)
+  FROM facturas
+  GROUP BY 1, 2, 3, 4;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE VIEW v_resumen AS
+SELECT
+  chat_id,
+  mes,
+  SUM(total) AS gasto_mes
+FROM gastos_mensuales
+WHERE mes IS NOT NULL
+GROUP BY 1, 2
+ORDER BY 1, 2 DESC;
+
+SELECT recalcular_gastos_mensuales();
+
+COMMIT;
@@ -0,0 +1,28 @@
+-- Cola de ingesta en segundo plano del bot.
+--   docker exec -i db_facturas psql -U $DB_USER -d $DB_NAME < database/migrations/005_cola_ingesta.sql
+
+BEGIN;
+
+-- Cola de ingesta: los archivos recibidos por el bot se procesan en segundo plano.
+-- estado: pendiente -> procesando -> ok | error
+CREATE TABLE IF NOT EXISTS trabajos_ingesta (
+  id BIGSERIAL PRIMARY KEY,
+  chat_id BIGINT NOT NULL,
+  mensaje_id BIGINT,                -- acuse de recibo que se edita con el resultado
+  nombre_archivo TEXT NOT NULL,
+  mime_type TEXT NOT NULL,
+  contenido BYTEA,                  -- se borra al terminar
+  estado VARCHAR(20) NOT NULL DEFAULT 'pendiente',
+  intentos INT NOT NULL DEFAULT 0,
+  resultado TEXT,
+  disponible_desde TIMESTAMP NOT NULL DEFAULT NOW(),
+  creado TIMESTAMP NOT NULL DEFAULT NOW(),
+  actualizado TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS trabajos_ingesta_pendientes_idx ON trabajos_ingesta (creado)
+  WHERE estado IN ('pendiente', 'procesando');
+CREATE INDEX IF NOT EXISTS trabajos_ingesta_en_curso_idx ON trabajos_ingesta (chat_id)
+  WHERE estado = 'procesando';
+
+COMMIT;
@@ -0,0 +1,34 @@
+-- Registro del texto extraído y los tiempos por etapa del servicio OCR.
+--   docker exec -i db_facturas psql -U $DB_USER -d $DB_NAME < database/migrations/006_logs_ocr.sql
+
+BEGIN;
+
+ALTER TABLE logs_ocr
+  ADD COLUMN IF NOT EXISTS chat_id BIGINT,             -- chat de Telegram, igual que facturas.chat_id
+  ADD COLUMN IF NOT EXISTS archivo_hash CHAR(64),     -- sha256 del archivo, igual que facturas.archivo_hash
+  ADD COLUMN IF NOT EXISTS nombre_archivo TEXT,
+  ADD COLUMN IF NOT EXISTS tipo_documento VARCHAR(20),
+  ADD COLUMN IF NOT EXISTS texto_capa TEXT,           -- capa de texto del PDF (sin OCR)
+  ADD COLUMN IF NOT EXISTS tiempos JSONB,             -- extraccion_ms, modelo_ms, total_ms
+  ADD COLUMN IF NOT EXISTS resultado JSONB,
+  ADD COLUMN IF NOT EXISTS prompt_version VARCHAR(16);
+
+CREATE INDEX IF NOT EXISTS logs_ocr_archivo_hash_idx ON logs_ocr (archivo_hash, fecha DESC);
+CREATE INDEX IF NOT EXISTS logs_ocr_chat_archivo_idx ON logs_ocr (chat_id, archivo_hash, fecha DESC);
+
+-- el servicio registra el texto antes de que el bot guarde la factura: se vincula al insertarla
+CREATE OR REPLACE FUNCTION logs_ocr_vincular_factura()
+RETURNS trigger AS $$
+BEGIN
+  UPDATE logs_ocr SET factura_id = NEW.id
+  WHERE chat_id = NEW.chat_id AND archivo_hash = NEW.archivo_hash AND factura_id IS NULL;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS facturas_logs_ocr ON facturas;
+CREATE TRIGGER facturas_logs_ocr
+AFTER INSERT ON facturas
+FOR EACH ROW WHEN (NEW.archivo_hash IS NOT NULL) EXECUTE FUNCTION logs_ocr_vincular_factura();
+
+COMMIT;
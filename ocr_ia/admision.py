@@ -0,0 +1,86 @@
+import os
+import threading
+from functools import wraps
+
+from flask import jsonify
+
+
+#config
+
+# solicitudes procesándose a la vez y esperando turno, por proceso worker; el turno cubre
+# solo la extracción, y con los valores por defecto de gunicorn.conf.py cada worker tiene
+# dos núcleos: dos extracciones a la vez (las páginas de un PDF comparten el pool de extraccion)
+OCR_MAX_EN_CURSO = int(os.getenv("OCR_MAX_EN_CURSO", "2"))
+OCR_MAX_EN_COLA = int(os.getenv("OCR_MAX_EN_COLA", "4"))
+OCR_ESPERA_COLA = float(os.getenv("OCR_ESPERA_COLA", "60"))
+OCR_RETRY_AFTER = int(os.getenv("OCR_RETRY_AFTER", "5"))
+
+_cupos = threading.BoundedSemaphore(OCR_MAX_EN_CURSO + OCR_MAX_EN_COLA)
+_en_curso = threading.BoundedSemaphore(OCR_MAX_EN_CURSO)
+
+
+class Rechazado(Exception):
+    def __init__(self, mensaje, status):
+        super().__init__(mensaje)
+        self.status = status
+
+
+def respuesta_rechazo(error: Rechazado):
+    response = jsonify({"error": str(error)})
+    response.status_code = error.status
+    response.headers["Retry-After"] = str(OCR_RETRY_AFTER)
+    return response
+
+
+def tomar_lugar():
+    """Ocupa un lugar en la cola sin esperar turno; devuelve la función que lo libera.
+
+    Lanza Rechazado (429) si la cola está llena.
+    """
+    if not _cupos.acquire(blocking=False):
+        raise Rechazado("Servicio saturado, reintentar más tarde", 429)
+    return _cupos.release
+
+
+def esperar_turno(espera: float = OCR_ESPERA_COLA):
+    """Espera turno de procesamiento; devuelve la función que lo libera.
+
+    Lanza Rechazado (503) si la espera vence. Lo usan los archivos de un lote,
+    que ya ocupan el lugar en la cola del lote.
+    """
+    if not _en_curso.acquire(timeout=espera):
+        raise Rechazado("Tiempo de espera en cola agotado", 503)
+    return _en_curso.release
+
+
+def tomar_turno():
+    """Ocupa un lugar en la cola y espera turno; devuelve la función que lo libera.
+
+    Lanza Rechazado (429 si la cola está llena, 503 si la espera vence).
+    """
+    liberar_lugar = tomar_lugar()
+    try:
+        liberar_turno = esperar_turno()
+    except Rechazado:
+        liberar_lugar()
+        raise
+
+    def liberar():
+        liberar_turno()
+        liberar_lugar()
+    return liberar
+
+
+def limitar(view):
+    """Control de admisión: cola acotada con 429 cuando está llena y 503 si la espera vence."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        try:
+            liberar = tomar_turno()
+        except Rechazado as e:
+            return respuesta_rechazo(e)
+        try:
+            return view(*args, **kwargs)
+        finally:
+            liberar()
+    return wrapper
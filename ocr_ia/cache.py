@@ -0,0 +1,102 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+
+#config
+
+OCR_CACHE_PATH = os.getenv("OCR_CACHE_PATH", "/tmp/ocr_ia_cache.sqlite3")
+OCR_CACHE_TTL = int(os.getenv("OCR_CACHE_TTL", str(30 * 24 * 3600)))
+OCR_CACHE_MAX_ENTRIES = int(os.getenv("OCR_CACHE_MAX_ENTRIES", "5000"))
+
+# cada cuántas escrituras se purgan entradas vencidas o sobrantes
+_PURGAR_CADA = 50
+
+_local = threading.local()
+_escrituras = 0
+_escrituras_lock = threading.Lock()
+
+
+def _conexion():
+    """Una conexión SQLite por hilo (sqlite3 no comparte conexiones entre hilos)."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(OCR_CACHE_PATH, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS resultados (
+                clave TEXT PRIMARY KEY,
+                resultado TEXT NOT NULL,
+                creado REAL NOT NULL,
+                usado REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS resultados_usado ON resultados (usado)")
+        _local.conn = conn
+    return conn
+
+
+def habilitado() -> bool:
+    return bool(OCR_CACHE_PATH) and OCR_CACHE_TTL > 0
+
+
+def clave(file_bytes: bytes, filename: str, version: str) -> str:
+    """Hash del archivo + extensión + versión de prompts/modelo."""
+    h = hashlib.sha256(file_bytes)
+    h.update(b"\0" + os.path.splitext(filename or "")[1].lower().encode("utf-8"))
+    h.update(b"\0" + version.encode("utf-8"))
+    return h.hexdigest()
+
+
+def obtener(k: str):
+    """Devuelve el resultado guardado o None si no existe o venció."""
+    if not habilitado():
+        return None
+    try:
+        conn = _conexion()
+        ahora = time.time()
+        row = conn.execute(
+            "SELECT resultado FROM resultados WHERE clave = ? AND creado > ?",
+            (k, ahora - OCR_CACHE_TTL),
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE resultados SET usado = ? WHERE clave = ?", (ahora, k))
+        return json.loads(row[0])
+    except sqlite3.Error:
+        # el cache nunca debe romper el procesamiento
+        return None
+
+
+def guardar(k: str, resultado: dict):
+    global _escrituras
+    if not habilitado():
+        return
+    try:
+        conn = _conexion()
+        ahora = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO resultados (clave, resultado, creado, usado) VALUES (?, ?, ?, ?)",
+            (k, json.dumps(resultado), ahora, ahora),
+        )
+        with _escrituras_lock:
+            _escrituras += 1
+            purgar = _escrituras % _PURGAR_CADA == 0
+        if purgar:
+            _purgar(conn, ahora)
+    except sqlite3.Error:
+        pass
+
+
+def _purgar(conn, ahora):
+    """Elimina entradas vencidas y, si sobran, las menos usadas recientemente."""
+    conn.execute("DELETE FROM resultados WHERE creado <= ?", (ahora - OCR_CACHE_TTL,))
+    conn.execute("""
+        DELETE FROM resultados WHERE clave IN (
+            SELECT clave FROM resultados ORDER BY usado DESC LIMIT -1 OFFSET ?
+        )
+    """, (OCR_CACHE_MAX_ENTRIES,))
@@ -1,6 +1,7 @@
 #!/bin/bash
 # Cargar secretos desde /run/secrets
 [ -f /run/secrets/openai_api_key ] && export OPENAI_API_KEY=$(cat /run/secrets/openai_api_key)
+[ -f /run/secrets/db_pass ] && export DB_PASS=$(cat /run/secrets/db_pass)
 
 # Mostrar confirmación
 echo "✅ Secrets cargados correctamente."
@@ -0,0 +1,148 @@
+import io
+import os
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import List
+
+from PIL import Image
+import pdfplumber
+import pytesseract
+from pdf2image import convert_from_path, pdfinfo_from_path
+
+
+#config
+
+# por debajo de esta cantidad de caracteres se considera que la página no tiene capa de texto
+OCR_MIN_CHARS_PAGINA = int(os.getenv("OCR_MIN_CHARS_PAGINA", "30"))
+OCR_LANG = os.getenv("OCR_LANG", "spa")
+# resolución de rasterizado de páginas escaneadas
+OCR_DPI = int(os.getenv("OCR_DPI", "200"))
+# procesos de OCR por página, compartidos por todas las solicitudes del worker; por defecto
+# se reparten los núcleos entre los workers de gunicorn (gunicorn.conf.py exporta la cantidad
+# real en WEB_CONCURRENCY); fuera de gunicorn hay un solo proceso y usa todos los núcleos
+_WORKERS_GUNICORN = int(os.getenv("WEB_CONCURRENCY", "1"))
+OCR_PAGE_WORKERS = int(os.getenv(
+    "OCR_PAGE_WORKERS", str(max(1, multiprocessing.cpu_count() // max(1, _WORKERS_GUNICORN)))
+))
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+@dataclass
+class Pagina:
+    texto: str
+    fuente: str  # "texto" (capa embebida del PDF) u "ocr"
+
+
+@dataclass
+class Extraccion:
+    paginas: List[Pagina] = field(default_factory=list)
+
+    @property
+    def texto(self) -> str:
+        return "\n".join(p.texto for p in self.paginas).strip()
+
+
+def es_pdf(file_bytes: bytes) -> bool:
+    return file_bytes[:4] == b"%PDF"
+
+
+def extraer(file_bytes: bytes) -> Extraccion:
+    """Extrae el texto una sola vez: capa de texto del PDF y OCR solo donde falta."""
+    if es_pdf(file_bytes):
+        return _extraer_pdf(file_bytes)
+    return extraer_imagen(Image.open(io.BytesIO(file_bytes)))
+
+
+def extraer_imagen(imagen) -> Extraccion:
+    """OCR de una imagen ya abierta (p. ej. la salida de preprocesado.preparar)."""
+    return Extraccion([Pagina(pytesseract.image_to_string(imagen, lang=OCR_LANG), "ocr")])
+
+
+def _extraer_pdf(pdf_bytes: bytes) -> Extraccion:
+    paginas = []
+    try:
+        with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+            for page in pdf.pages:
+                paginas.append(Pagina((page.extract_text() or "").strip(), "texto"))
+    except Exception:
+        paginas = None
+
+    escaneadas = [i for i, p in enumerate(paginas or []) if len(p.texto) < OCR_MIN_CHARS_PAGINA]
+    if paginas is not None and not escaneadas:
+        return Extraccion(paginas)
+
+    # poppler lee el archivo: cada página se rasteriza por separado sin copiar el PDF
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+        tmp.write(pdf_bytes)
+        tmp.flush()
+        if paginas is None:
+            # PDF que pdfplumber no puede leer: se hace OCR de todas las páginas
+            total = pdfinfo_from_path(tmp.name)["Pages"]
+            return Extraccion([Pagina(t, "ocr") for t in _ocr_paginas(tmp.name, range(1, total + 1))])
+
+        # solo se rasterizan las páginas escaneadas
+        textos = _ocr_paginas(tmp.name, [i + 1 for i in escaneadas])
+    for i, texto in zip(escaneadas, textos):
+        paginas[i] = Pagina(texto, "ocr")
+    return Extraccion(paginas)
+
+
+def _ocr(imagen) -> str:
+    return pytesseract.image_to_string(imagen, lang=OCR_LANG).strip()
+
+
+def _ocr_pagina_pdf(pdf_path: str, numero: int) -> str:
+    """Rasteriza una sola página, le aplica OCR y la libera."""
+    imagen = convert_from_path(
+        pdf_path, dpi=OCR_DPI, first_page=numero, last_page=numero, grayscale=True
+    )[0]
+    try:
+        return _ocr(imagen)
+    finally:
+        imagen.close()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # forkserver: el worker de gunicorn tiene hilos y no conviene hacer fork directo
+                _pool = ProcessPoolExecutor(
+                    max_workers=OCR_PAGE_WORKERS,
+                    mp_context=multiprocessing.get_context("forkserver"),
+                )
+    return _pool
+
+
+def _ocr_paginas(pdf_path: str, numeros) -> List[str]:
+    """OCR de varias páginas en paralelo; el resultado respeta el orden de entrada.
+
+    Cada proceso rasteriza su propia página, así en memoria hay como máximo
+    una imagen por proceso del pool.
+    """
+    numeros = list(numeros)
+    if len(numeros) <= 1 or OCR_PAGE_WORKERS <= 1:
+        return [_ocr_pagina_pdf(pdf_path, n) for n in numeros]
+    try:
+        return list(_get_pool().map(_ocr_pagina_pdf, [pdf_path] * len(numeros), numeros))
+    except BrokenProcessPool:
+        # un proceso del pool murió (p. ej. por memoria): se recrea y se sigue en línea
+        cerrar()
+        return [_ocr_pagina_pdf(pdf_path, n) for n in numeros]
+
+
+def cerrar():
+    """Apaga el pool de procesos (al terminar el worker)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
@@ -0,0 +1,140 @@
+"""Modelo de factura que devuelve el servicio: se valida y normaliza una sola vez.
+
+La respuesta JSON lleva la fecha en ISO (YYYY-MM-DD o null) y los importes como
+números, así el bot no vuelve a interpretarlos.
+"""
+
+import json
+import re
+from dataclasses import asdict, dataclass, field
+from datetime import date
+from typing import List, Optional
+
+
+# cambia si cambia el formato de la respuesta (forma parte de la clave del cache)
+VERSION = "2"
+
+CATEGORIAS = (
+    "Supermercado", "Delivery", "Petshop", "Farmacia", "Alquiler", "Expensas", "Servicios", "Otros",
+)
+
+_CERCO = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$")
+_FECHA_DMA = re.compile(r"\b(\d{1,2})[/-](\d{1,2})[/-](\d{4}|\d{2})\b")
+_FECHA_ISO = re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b")
+_NO_NUMERICO = re.compile(r"[^\d,.\-]")
+_MILES_COMA = re.compile(r"-?\d{1,3}(,\d{3})+")
+_MILES_PUNTO = re.compile(r"-?\d{1,3}\.\d{3}")
+
+
+class RespuestaInvalida(ValueError):
+    """La respuesta del modelo no es un JSON de factura."""
+
+
+@dataclass
+class Item:
+    nombre: str
+    precio: float
+
+
+@dataclass
+class Factura:
+    proveedor: str
+    fecha: Optional[date]
+    total: float
+    categoria: str
+    items: List[Item] = field(default_factory=list)
+    origen: str = "modelo"  # "modelo" o "reglas"
+
+    def a_dict(self) -> dict:
+        data = asdict(self)
+        data["fecha"] = self.fecha.isoformat() if self.fecha else None
+        return data
+
+
+def parse_fecha(valor) -> Optional[date]:
+    """date, DD/MM/YYYY, DD-MM-YY o YYYY-MM-DD; None si no es válida o no es anterior a hoy."""
+    if not valor:
+        return None
+    texto = str(valor)
+    m = _FECHA_ISO.search(texto)
+    if isinstance(valor, date):
+        año, mes, dia = valor.year, valor.month, valor.day
+    elif m:
+        año, mes, dia = (int(g) for g in m.groups())
+    else:
+        m = _FECHA_DMA.search(texto)
+        if not m:
+            return None
+        dia, mes, año = (int(g) for g in m.groups())
+        if año < 100:
+            año += 2000
+    try:
+        f = date(año, mes, dia)
+    except ValueError:
+        return None
+    # se descartan fechas futuras o de hoy (el modelo suele inventar la fecha actual)
+    if f.year < 2000 or f >= date.today():
+        return None
+    return f
+
+
+def parse_importe(valor) -> float:
+    """Número, '199.968,00', '1,234.56' o '$ 4532.40' -> float; 0.0 si no se entiende."""
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return float(valor)
+    texto = _NO_NUMERICO.sub("", str(valor or ""))
+    if not texto:
+        return 0.0
+    coma, punto = texto.rfind(","), texto.rfind(".")
+    if coma >= 0 and punto >= 0:
+        # el separador que aparece último es el decimal
+        decimal = "," if coma > punto else "."
+        miles = "." if decimal == "," else ","
+        texto = texto.replace(miles, "").replace(decimal, ".")
+    elif coma >= 0:
+        # "1234,5" o "1234,56" es decimal; "1,234" o "1,234,567" son miles
+        if _MILES_COMA.fullmatch(texto):
+            texto = texto.replace(",", "")
+        else:
+            texto = texto.replace(",", ".")
+    elif texto.count(".") > 1 or _MILES_PUNTO.fullmatch(texto):
+        # formato argentino sin decimales: "14.691" o "1.234.567"
+        texto = texto.replace(".", "")
+    try:
+        return float(texto)
+    except ValueError:
+        return 0.0
+
+
+def desde_dict(data: dict, origen: str = "modelo") -> Factura:
+    """Valida y normaliza un dict (respuesta del modelo o de las reglas)."""
+    if not isinstance(data, dict):
+        raise RespuestaInvalida("la respuesta no es un objeto JSON")
+
+    # tolera variantes como "Delivery (PedidosYa, Rappi)" o "supermercado"
+    texto = str(data.get("categoria") or "").strip().lower()
+    categoria = next((c for c in CATEGORIAS if texto.startswith(c.lower())), "Otros")
+
+    items = []
+    for item in data.get("items") or []:
+        if isinstance(item, dict):
+            nombre = str(item.get("nombre") or "Sin descripción").strip()
+            items.append(Item(nombre, parse_importe(item.get("precio"))))
+
+    return Factura(
+        proveedor=str(data.get("proveedor") or "").strip(),
+        fecha=parse_fecha(data.get("fecha")),
+        total=parse_importe(data.get("total")),
+        categoria=categoria,
+        items=items,
+        origen=origen,
+    )
+
+
+def desde_respuesta(contenido: str) -> Factura:
+    """Texto devuelto por el modelo -> Factura; lanza RespuestaInvalida si no es JSON."""
+    try:
+        data = json.loads(_CERCO.sub("", contenido))
+    except (TypeError, ValueError) as e:
+        raise RespuestaInvalida(str(e)) from e
+    return desde_dict(data)
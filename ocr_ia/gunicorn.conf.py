@@ -0,0 +1,35 @@
+import os
+import multiprocessing
+
+from admision import OCR_MAX_EN_CURSO, OCR_MAX_EN_COLA
+
+
+bind = os.getenv("OCR_BIND", "0.0.0.0:5000")
+
+# un proceso cada dos núcleos: el OCR es CPU intensivo y no comparte el GIL entre workers, y
+# cada worker usa los núcleos que le tocan para el OCR en paralelo de las páginas de un PDF
+workers = int(os.getenv("WEB_CONCURRENCY", str(max(1, multiprocessing.cpu_count() // 2))))
+# los workers heredan el valor: extraccion reparte los núcleos según la cantidad real de workers
+os.environ["WEB_CONCURRENCY"] = str(workers)
+
+# cada worker atiende en hilos las solicitudes en curso más las que esperan turno;
+# el resto se rechaza con 429 (ver admision.py)
+worker_class = "gthread"
+threads = OCR_MAX_EN_CURSO + OCR_MAX_EN_COLA + 1
+backlog = int(os.getenv("OCR_BACKLOG", "64"))
+
+# OCR + modelo pueden tardar; al apagar se espera a que terminen las solicitudes en curso
+timeout = int(os.getenv("OCR_WORKER_TIMEOUT", "180"))
+graceful_timeout = int(os.getenv("OCR_GRACEFUL_TIMEOUT", "120"))
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+
+
+def worker_exit(server, worker):
+    # apaga el pool de procesos de OCR del worker y escribe los logs_ocr pendientes
+    import extraccion
+    import registro
+    extraccion.cerrar()
+    registro.cerrar()
@@ -1,239 +1,211 @@
-from flask import Flask, request, jsonify
-from openai import OpenAI
-import base64, io, os, json, re
-from PIL import Image
-import pdfplumber
-import pytesseract
-from pdf2image import convert_from_bytes
-from datetime import datetime
+from flask import Flask, Response, request, jsonify
+import base64, os, json, re
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import hashlib
+
+import admision
+import cache
+import extraccion
+import factura
+import llm
+import plantillas
+import preprocesado
+import prompts
+import reglas
+import registro
 
 app = Flask(__name__)
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-# funciones de extracción
-def extract_text_from_pdf(pdf_bytes):
-    """Extrae texto directo (si el PDF tiene texto embebido)."""
-    text = ""
-    try:
-        with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-            for page in pdf.pages:
-                text += page.extract_text() or ""
-    except Exception:
-        text = ""
-    return text.strip()
+MODELO = "gpt-4o-mini"
+
+# /process_batch: archivos de un lote procesados a la vez (hilos del worker) y tamaño máximo;
+# hasta OCR_MAX_EN_CURSO extraen y el resto espera turno o al modelo, así se superponen
+OCR_BATCH_PARALELO = int(os.getenv("OCR_BATCH_PARALELO", "4"))
+OCR_BATCH_MAX_ARCHIVOS = int(os.getenv("OCR_BATCH_MAX_ARCHIVOS", "50"))
+# espera máxima de turno por archivo del lote (la respuesta ya está en curso, se puede esperar más)
+OCR_BATCH_ESPERA_TURNO = float(os.getenv("OCR_BATCH_ESPERA_TURNO", "600"))
+
+_lotes = ThreadPoolExecutor(max_workers=OCR_BATCH_PARALELO, thread_name_prefix="lote")
 
+logger = logging.getLogger("ocr_ia")
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
 
-def extract_text_with_ocr(pdf_bytes):
-    """Convierte PDF escaneado a imágenes y aplica OCR."""
-    pages = convert_from_bytes(pdf_bytes)
-    text = ""
-    for page in pages:
-        text += pytesseract.image_to_string(page, lang="spa")
-    return text.strip()
 
+# cambia si cambian los prompts, el modelo o el formato de respuesta, e invalida el cache de resultados
+PROMPT_VERSION = hashlib.sha256(
+    f"{MODELO}\0{prompts.VERSION}\0{factura.VERSION}".encode("utf-8")
+).hexdigest()[:16]
 
-def extract_ocr_text(image_bytes):
-    """OCR general (PDF o imagen)."""
+
+def _clasificar(resultado):
+    """Reglas de categoría y proveedor de reglas.json.
+
+    Se aplican en cada respuesta, también a las cacheadas, porque las reglas se
+    pueden editar en caliente.
+    """
+    if resultado.get("proveedor"):
+        resultado["proveedor"], resultado["categoria"] = reglas.clasificar(
+            resultado["proveedor"], resultado["categoria"]
+        )
+    return resultado
+
+
+def _ms(desde):
+    return int((time.monotonic() - desde) * 1000)
+
+
+def interpretar_texto(texto, tipo_documento, filename, imagen_modelo=None, tiempos=None):
+    """Del texto extraído al resultado (reglas o modelo); devuelve (resultado, status HTTP).
+
+    Sin imagen_modelo (re-extracción desde logs_ocr) las fotos se interpretan
+    solo con el texto. Lanza llm.LLMError si el modelo no responde.
+    """
+    ocr_text = re.sub(r"\s+", " ", texto)
+
+    # documentos de formato conocido: se extraen con reglas y no se llama al modelo
+    por_reglas = plantillas.extraer(tipo_documento, ocr_text)
+    if por_reglas is not None:
+        return factura.desde_dict(por_reglas, origen="reglas").a_dict(), 200
+
+    # procesamiento según tipo de archivo: las transferencias van solo con texto
+    es_imagen = filename.lower().endswith((".jpg", ".jpeg", ".png"))
+    if tipo_documento == "transferencia":
+        mensajes = prompts.mensajes(tipo_documento, texto)
+    elif es_imagen and imagen_modelo is not None:
+        image_base64 = base64.b64encode(imagen_modelo).decode("utf-8")
+        mensajes = prompts.mensajes(tipo_documento, texto, image_base64)
+    elif es_imagen or filename.lower().endswith(".pdf"):
+        if not texto:
+            return {"error": "No hay texto para interpretar" if es_imagen else "No se pudo extraer texto del PDF"}, 400
+        mensajes = prompts.mensajes(tipo_documento, texto)
+    else:
+        return {"error": "Formato de archivo no soportado"}, 400
+
+    # llamada al modelo
+    tokens_estimados = prompts.contar_tokens(MODELO, mensajes)
+    inicio = time.monotonic()
     try:
-        if image_bytes[:4] == b"%PDF":
-            pages = convert_from_bytes(image_bytes)
-            text = ""
-            for i, page in enumerate(pages):
-                text += pytesseract.image_to_string(page, lang="spa") + "\n"
-            return text.strip()
-        else:
-            image = Image.open(io.BytesIO(image_bytes))
-            return pytesseract.image_to_string(image, lang="spa")
-    except Exception as e:
-        pass
-        return ""
+        response = llm.completar(
+            model=MODELO,
+            messages=mensajes,
+            response_format=prompts.FORMATO_RESPUESTA,
+            temperature=0.2,
+        )
+    finally:
+        if tiempos is not None:
+            tiempos["modelo_ms"] = _ms(inicio)
+    usage = response.usage
+    logger.info(
+        "modelo tipo=%s tokens_texto=%d prompt_tokens=%s completion_tokens=%s ms=%d",
+        tipo_documento, tokens_estimados,
+        usage.prompt_tokens if usage else "?", usage.completion_tokens if usage else "?",
+        _ms(inicio),
+    )
+
+    # validación y normalización (fecha ISO, importes numéricos) en un solo paso
+    raw = response.choices[0].message.content.strip()
+    try:
+        return factura.desde_respuesta(raw).a_dict(), 200
+    except factura.RespuestaInvalida:
+        return {"raw_response": raw}, 200
+
 
+def _es_factura(resultado):
+    return "error" not in resultado and "raw_response" not in resultado
 
-# normalización de datos
-def normalizar_factura(data):
-    """Limpia y valida campos comunes de la factura (fecha, total)."""
+
+def procesar_archivo(file_bytes, filename, en_lote=False, chat_id=None):
+    """Procesa un archivo (extracción + reglas o modelo); devuelve (resultado, status HTTP).
+
+    La admisión se pide recién si el resultado no está en cache: un acierto
+    responde enseguida aunque haya OCR en curso. El lugar en la cola se ocupa
+    hasta responder, pero el turno de procesamiento solo durante la extracción
+    (CPU); la concurrencia del modelo la limita llm. Los archivos de un lote
+    (en_lote) usan el lugar del lote y esperan turno hasta OCR_BATCH_ESPERA_TURNO.
+    """
     try:
-        
-        fecha_valida = None
-        if "fecha" in data and data["fecha"]:
-            texto = str(data["fecha"]).strip()
-            match = re.search(r"(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})", texto)
-            if match:
-                fecha_raw = match.group(1)
-                formatos = ["%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%d/%m/%y"]
-                for fmt in formatos:
-                    try:
-                        f = datetime.strptime(fecha_raw, fmt)
-                        if (
-                            f.date() != datetime.now().date()
-                            and 2000 <= f.year <= datetime.now().year
-                            and f <= datetime.now()
-                        ):
-                            fecha_valida = f
-                            break
-                    except Exception:
-                        continue
-
-        if fecha_valida:
-            data["fecha"] = fecha_valida.strftime("%d/%m/%Y")
-        else:
-            data["fecha"] = ""
+        # mismo archivo + mismos prompts/modelo: se devuelve el resultado anterior
+        clave_cache = cache.clave(file_bytes, filename, PROMPT_VERSION)
+        cacheado = cache.obtener(clave_cache)
+        if cacheado is not None:
+            return _clasificar(cacheado), 200
 
-        # normaliza el total
-        if "total" in data and data["total"]:
-            num = re.sub(r"[^\d,\.]", "", str(data["total"]))
-            num = num.replace(",", ".")
+        espera = OCR_BATCH_ESPERA_TURNO if en_lote else admision.OCR_ESPERA_COLA
+        try:
+            liberar_lugar = (lambda: None) if en_lote else admision.tomar_lugar()
+        except admision.Rechazado as e:
+            return {"error": str(e)}, e.status
+        try:
+            try:
+                liberar_turno = admision.esperar_turno(espera)
+            except admision.Rechazado as e:
+                return {"error": str(e)}, e.status
             try:
-                data["total"] = float(num)
-            except Exception:
-                data["total"] = 0.0
+                extraido = _extraer(file_bytes)
+            finally:
+                liberar_turno()
+            return _interpretar_y_registrar(file_bytes, filename, clave_cache, extraido, chat_id)
+        finally:
+            liberar_lugar()
 
     except Exception as e:
-        pass
+        return {"error": str(e)}, 500
 
-    return data
 
+def _extraer(file_bytes):
+    """(texto, capa de texto del PDF, imagen para el modelo, ms de extracción)."""
+    # extracción única: capa de texto del PDF y OCR solo en las páginas escaneadas;
+    # las fotos se normalizan una vez y la misma imagen va a Tesseract y al modelo
+    inicio = time.monotonic()
+    imagen_modelo = file_bytes
+    texto_capa = None
+    try:
+        if extraccion.es_pdf(file_bytes):
+            extraido = extraccion.extraer(file_bytes)
+            texto_capa = "\n".join(p.texto for p in extraido.paginas if p.fuente == "texto")
+        else:
+            normalizada = preprocesado.preparar(file_bytes)
+            imagen_modelo = normalizada.jpeg
+            extraido = extraccion.extraer_imagen(normalizada.imagen)
+        texto = extraido.texto
+    except Exception:
+        texto = ""
+    return texto, texto_capa, imagen_modelo, _ms(inicio)
 
-def detectar_tipo_documento(texto):
-    """Detecta si es una factura común o un comprobante de transferencia."""
-    texto_lower = texto.lower()
-    
 
-    
-    # indicadores específicos de transferencia bancaria
-    indicadores_transferencia = [
-        "comprobante de transferencia",
-        "importe debitado",
-        "cuenta destino", 
-        "titular cuenta destino",
-        "fecha de ejecución",
-        "cuenta débito",
-        "n° comprobante",
-        "nro comprobante",
-        "numero comprobante"
-    ]
-    
-    # nombres específicos de bancos
-    bancos = ["santander", "galicia", "bbva", "hsbc", "macro", "nación", "provincia"]
-    
-    # destinatarios conocidos que indican transferencia
-    destinatarios_conocidos = [
-        "menno gabriela alejandra",
-        "menno gabriela",
-        "grupo zafche", 
-        "zafche s.a.",
-        "cons ed mistica",
-        "mistica calle",
-        "calle 7 num 39",
-        "ed mistica"
-    ]
-    
-   
-    coincidencias_transferencia = sum(1 for ind in indicadores_transferencia if ind in texto_lower)
-    coincidencias_banco = sum(1 for banco in bancos if banco in texto_lower)
-    coincidencias_destinatarios = sum(1 for dest in destinatarios_conocidos if dest in texto_lower)
-    
-    
-    es_transferencia = (
-        
-        ("santander" in texto_lower and "comprobante" in texto_lower) or
-        
-        # reglas de respaldo
-        ("comprobante de transferencia" in texto_lower) or
-        ("importe debitado" in texto_lower) or
-        ("cuenta destino" in texto_lower) or
-        ("titular cuenta" in texto_lower) or
-        
-        # si menciona destinatarios específicos
-        any(dest in texto_lower for dest in ["cons ed mistica", "menno gabriela", "grupo zafche"])
+def _interpretar_y_registrar(file_bytes, filename, clave_cache, extraido, chat_id):
+    inicio = time.monotonic()
+    texto, texto_capa, imagen_modelo, extraccion_ms = extraido
+    tiempos = {"extraccion_ms": extraccion_ms}
+
+    tipo_documento = reglas.tipo_documento(re.sub(r"\s+", " ", texto))
+    try:
+        resultado, status = interpretar_texto(texto, tipo_documento, filename, imagen_modelo, tiempos)
+    except llm.LLMError as e:
+        resultado, status = {"error": str(e)}, e.status
+    tiempos["total_ms"] = extraccion_ms + _ms(inicio)
+
+    # el texto queda guardado aunque el modelo falle: se puede reinterpretar con /reprocess
+    registro.registrar(
+        hashlib.sha256(file_bytes).hexdigest(), filename, tipo_documento,
+        texto, texto_capa, tiempos, resultado, PROMPT_VERSION, chat_id=chat_id,
     )
-    
-    return "transferencia" if es_transferencia else "factura"
 
-    
-    return "transferencia" if es_transferencia else "factura"
+    if status != 200 or not _es_factura(resultado):
+        return resultado, status
+    cache.guardar(clave_cache, resultado)
+    return _clasificar(resultado), 200
 
 
-def procesar_transferencia_bancaria(texto):
-    """Procesa específicamente comprobantes de transferencias bancarias."""
-    
-    prompt_transferencia = """
-ANÁLISIS DE TRANSFERENCIA BANCARIA
-
-REGLA PRINCIPAL - IDENTIFICACIÓN DEL PROVEEDOR:
-El PROVEEDOR es quien RECIBE el dinero, NO el banco que procesa la transferencia.
-
-PROHIBIDO: "Santander", "Banco Santander", "Galicia", etc.
-CORRECTO: El nombre exacto del "Titular cuenta destino"
-
-CAMPOS A BUSCAR:
-- "Titular cuenta destino" - ESE es el proveedor
-- "Destinatario" - ESE es el proveedor  
-- "Beneficiario" - ESE es el proveedor
-
-CAMPOS A EXTRAER:
-1. **proveedor**: EL NOMBRE EXACTO del titular de la cuenta destino
-2. **fecha**: Busca "Fecha de ejecución" - formato DD/MM/YYYY  
-3. **total**: Busca "Importe debitado" - convierte a número decimal
-4. **items**: SIEMPRE: [{"nombre": "Transferencia bancaria", "precio": [TOTAL_NUMERICO]}]
-
-PROHIBICIÓN ABSOLUTA SOBRE EL PROVEEDOR:
-- NUNCA uses "Santander", "Galicia", "BBVA", etc. como proveedor
-- El banco es quien HACE la transferencia, NO quien la recibe
-- El proveedor SIEMPRE debe ser el "Titular cuenta destino"
-- Busca la línea que dice "Titular cuenta destino" y usa ESE texto exacto
-
-EJEMPLO CORRECTO:
-- Si ves "Titular cuenta destino: Cons Ed Mistica Calle 7 Num 39"
-- Entonces proveedor: "Cons Ed Mistica Calle 7 Num 39"
-- NUNCA proveedor: "Santander"
-
-5. **categoria**: Usa SOLO estas opciones:
-
-CATEGORÍAS OBLIGATORIAS:
-- Si titular contiene "Menno Gabriela" -> "Alquiler"  
-- Si titular contiene "Grupo Zafche" -> "Alquiler"
-- Si titular contiene "Cons Ed Mistica" -> "Expensas"
-- Cualquier otro caso -> "Otros"
-
-PROHIBICIONES:
-- NUNCA uses "Servicios" 
-- NUNCA uses "Facturas/Servicios"
-- NUNCA inventes categorías
-
-EJEMPLOS DE SALIDA CORRECTA:
-
-Para "Menno Gabriela Alejandra":
-{
-  "proveedor": "Menno Gabriela Alejandra",
-  "fecha": "03/10/2025",
-  "total": 199968.00,
-  "items": [{"nombre": "Transferencia bancaria", "precio": 199968.00}],
-  "categoria": "Alquiler"
-}
-
-Para "Grupo Zafche S.a.":
-{
-  "proveedor": "Grupo Zafche S.a.", 
-  "fecha": "03/10/2025",
-  "total": 268560.00,
-  "items": [{"nombre": "Transferencia bancaria", "precio": 268560.00}],
-  "categoria": "Alquiler"
-}
-
-Para "Cons Ed Mistica Calle 7 Num 39":
-{
-  "proveedor": "Cons Ed Mistica Calle 7 Num 39",
-  "fecha": "03/10/2025",
-  "total": 14691.00,
-  "items": [{"nombre": "Transferencia bancaria", "precio": 14691.00}],
-  "categoria": "Expensas"
-}
-
-ANALIZA ESTE COMPROBANTE:
-"""
-    
-    return prompt_transferencia + texto
+def _chat_id(datos=None):
+    """Chat de Telegram del archivo (lo manda el bot) para vincular logs_ocr con su factura."""
+    valor = (datos or {}).get("chat_id") or request.form.get("chat_id") or request.args.get("chat_id")
+    try:
+        return int(valor) if valor else None
+    except (TypeError, ValueError):
+        return None
 
 
 # endpoint principal
@@ -254,133 +226,126 @@ def process_invoice():
         if not file_bytes:
             return jsonify({"error": "El archivo está vacío"}), 400
 
-        # OCR previo
-        ocr_text = extract_ocr_text(file_bytes)
-        ocr_text = re.sub(r"\s+", " ", ocr_text)
+        datos = request.json if request.is_json else None
+        resultado, status = procesar_archivo(file_bytes, filename, chat_id=_chat_id(datos))
+        if status in (429, 503):
+            # servicio o modelo saturado: el bot reintenta después de Retry-After
+            return jsonify(resultado), status, {"Retry-After": str(admision.OCR_RETRY_AFTER)}
+        return jsonify(resultado), status
 
-        
-        tipo_documento = detectar_tipo_documento(ocr_text)
-        
-        
-        if tipo_documento == "transferencia":
-            prompt = procesar_transferencia_bancaria(ocr_text)
-        else:
-            
-            prompt = """
-Analiza cuidadosamente la siguiente factura y devuelve los campos solicitados en formato JSON.
-
-Tu tarea es **extraer información REAL del documento, no inventarla**.  
-Si algún dato no aparece, debes dejar el campo vacío o null.
-
-Campos requeridos:
-- **proveedor**: nombre de la empresa o comercio emisor.
-- **fecha**: la fecha de emisión de la factura (NO inventar ni usar la actual).
-- **total**: el importe total (buscar palabras como 'TOTAL', 'TOTAL FINAL', 'IMPORTE A PAGAR', 'TOTAL FACTURA').
-- **items**: lista de productos o conceptos, con nombre y precio (si están visibles).
-- **categoria**: clasifica en una de estas:
-  1. Supermercado
-  2. Delivery (PedidosYa, Rappi)
-  3. Petshop
-  4. Farmacia
-  5. Alquiler
-  6. Expensas
-  7. Otros
-  8. Servicios
-
-REGLAS IMPORTANTES:
-- **No uses la fecha del día actual bajo ningún motivo.**
-- **Si no estás seguro de la fecha, deja `"fecha": ""`.**
-- Usa solo la fecha que esté junto a palabras como “Fecha”, “Emisión”, “Factura”, “Fecha de compra”.
-- Ignora fechas de vencimiento o entrega.
-- Devuelve **solo JSON válido**, sin texto adicional.
-- Para el campo "total", prioriza el número junto a palabras como “TOTAL”, “TOTAL A PAGAR” o “IMPORTE FINAL”.
-- Si el documento no tiene texto legible o el total no se entiende, deja el valor en cero.
-
-Ejemplo de salida válida:
-{
-  "proveedor": "Carrefour",
-  "fecha": "12/09/2024",
-  "total": 4532.40,
-  "items": [{"nombre": "Pan", "precio": 250.00}],
-  "categoria": "Supermercado"
-}
-"""
-
-        # procesamiento según tipo de archivo
-        if tipo_documento == "transferencia":
-            
-            content = [{"type": "text", "text": prompt}]
-        else:
-            
-            if filename.lower().endswith((".jpg", ".jpeg", ".png")):
-                image_base64 = base64.b64encode(file_bytes).decode("utf-8")
-                content = [
-                    {"type": "text", "text": prompt + "\n\nTexto OCR extraído:\n" + ocr_text},
-                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{image_base64}"}}
-                ]
-            elif filename.lower().endswith(".pdf"):
-                text = extract_text_from_pdf(file_bytes)
-                if not text or len(text) < 30:
-                    text = extract_text_with_ocr(file_bytes)
-                if not text:
-                    return jsonify({"error": "No se pudo extraer texto del PDF"}), 400
-                content = [{"type": "text", "text": f"{prompt}\n\nTexto de la factura:\n{text}"}]
-            else:
-                return jsonify({"error": "Formato de archivo no soportado"}), 400
-
-        # llamada al modelo
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "Eres un analizador de facturas que devuelve JSON estructurado."},
-                {"role": "user", "content": content}
-            ],
-            temperature=0.2,
-        )
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        # limpieza
-        raw = response.choices[0].message.content.strip()
-        clean = re.sub(r"^```json|```$", "", raw, flags=re.MULTILINE).strip()
 
-        try:
-            parsed = json.loads(clean)
-
-            # anula fechas iguales a hoy o futuras
-            if parsed.get("fecha"):
-                fecha_str = str(parsed["fecha"]).strip()
-                formatos = ["%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%d/%m/%y"]
-                for fmt in formatos:
-                    try:
-                        f = datetime.strptime(fecha_str, fmt)
-                        if f.date() == datetime.now().date() or f.date() > datetime.now().date():
-                            parsed["fecha"] = ""
-                        break
-                    except Exception:
-                        continue
-
-            
-            parsed = normalizar_factura(parsed)
-
-            #vuelve a verificar después de normalizar
-            if parsed.get("fecha"):
-                fecha_str = parsed["fecha"]
-                for fmt in ["%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%d/%m/%y"]:
-                    try:
-                        f = datetime.strptime(fecha_str, fmt)
-                        if f.date() == datetime.now().date() or f > datetime.now():
-                            parsed["fecha"] = ""
-                        break
-                    except Exception:
-                        continue
-
-            return jsonify(parsed), 200
-
-        except Exception:
-            return jsonify({"raw_response": raw}), 200
+@app.route("/reprocess", methods=["POST"])
+def reprocess():
+    """Vuelve a interpretar el último texto guardado en logs_ocr para un archivo,
+    sin repetir la extracción. Recibe {"archivo_hash": <sha256 del archivo>, "chat_id": ...};
+    chat_id es opcional y limita la búsqueda a los registros de ese chat."""
+    datos = request.get_json(silent=True) or {}
+    archivo_hash = str(datos.get("archivo_hash") or "").strip().lower()
+    if not re.fullmatch(r"[0-9a-f]{64}", archivo_hash):
+        return jsonify({"error": "Falta archivo_hash (sha256 del archivo)"}), 400
 
+    try:
+        chat_id = _chat_id(datos)
+        guardado = registro.ultimo_texto(archivo_hash, chat_id)
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return jsonify({"error": f"No se pudo leer logs_ocr: {e}"}), 503
+    if guardado is None:
+        return jsonify({"error": "No hay texto guardado para ese archivo"}), 404
+    texto, filename = guardado
+    filename = filename or "archivo.pdf"
+
+    # sin OCR no hace falta turno de procesamiento, pero sí un lugar en la cola
+    try:
+        liberar = admision.tomar_lugar()
+    except admision.Rechazado as e:
+        return admision.respuesta_rechazo(e)
+
+    inicio = time.monotonic()
+    tiempos = {"extraccion_ms": 0}
+    tipo_documento = reglas.tipo_documento(re.sub(r"\s+", " ", texto))
+    try:
+        resultado, status = interpretar_texto(texto, tipo_documento, filename, tiempos=tiempos)
+    except llm.LLMError as e:
+        resultado, status = {"error": str(e)}, e.status
+    finally:
+        liberar()
+    tiempos["total_ms"] = _ms(inicio)
+
+    registro.registrar(
+        archivo_hash, filename, tipo_documento, texto, None, tiempos, resultado, PROMPT_VERSION,
+        fuente="reprocesado", chat_id=chat_id,
+    )
+    if status == 200 and _es_factura(resultado):
+        resultado = _clasificar(resultado)
+    if status == 503:
+        return jsonify(resultado), status, {"Retry-After": str(admision.OCR_RETRY_AFTER)}
+    return jsonify(resultado), status
+
+
+def _archivos_del_lote():
+    """Archivos de /process_batch: multipart (campo "file" repetido) o NDJSON.
+
+    En NDJSON cada línea es {"filename": ..., "data": <base64>}. El chat_id del
+    lote va como campo del formulario o, en NDJSON, en la query (?chat_id=).
+    """
+    if request.mimetype == "application/x-ndjson":
+        archivos = []
+        for linea in request.get_data().splitlines():
+            if linea.strip():
+                item = json.loads(linea)
+                archivos.append((item.get("filename", "file"), base64.b64decode(item["data"])))
+        return archivos
+    return [(f.filename, f.read()) for f in request.files.getlist("file")]
+
+
+@app.route("/process_batch", methods=["POST"])
+def process_batch():
+    """Procesa varios archivos en una solicitud y devuelve un resultado por línea (NDJSON)
+    a medida que cada uno termina. "indice" es la posición del archivo en el pedido."""
+    try:
+        archivos = _archivos_del_lote()
+    except Exception as e:
+        return jsonify({"error": f"Lote inválido: {e}"}), 400
+    if not archivos:
+        return jsonify({"error": "No se encontró ningún archivo"}), 400
+    chat_id = _chat_id()
+    if len(archivos) > OCR_BATCH_MAX_ARCHIVOS:
+        return jsonify({"error": f"Se admiten hasta {OCR_BATCH_MAX_ARCHIVOS} archivos por lote"}), 413
+
+    # el lote ocupa un solo lugar en la cola mientras dura la respuesta, pero cada
+    # archivo espera su turno de procesamiento como cualquier solicitud
+    try:
+        liberar = admision.tomar_lugar()
+    except admision.Rechazado as e:
+        return admision.respuesta_rechazo(e)
+
+    def procesar(archivo):
+        filename, file_bytes = archivo
+        if not file_bytes:
+            return {"error": "El archivo está vacío"}, 400
+        return procesar_archivo(file_bytes, filename, en_lote=True, chat_id=chat_id)
+
+    def generar():
+        futuros = {_lotes.submit(procesar, a): i for i, a in enumerate(archivos)}
+        try:
+            for futuro in as_completed(futuros):
+                i = futuros[futuro]
+                resultado, status = futuro.result()
+                linea = {"indice": i, "filename": archivos[i][0], "status": status, "resultado": resultado}
+                yield json.dumps(linea, ensure_ascii=False) + "\n"
+        finally:
+            # el cliente cortó la conexión: no se procesa el resto
+            for futuro in futuros:
+                futuro.cancel()
+
+    response = Response(generar(), mimetype="application/x-ndjson")
+    response.call_on_close(liberar)
+    return response
 
 
 if __name__ == "__main__":
+    # solo para desarrollo; en producción: gunicorn -c gunicorn.conf.py invoice_ai_service:app
     app.run(host="0.0.0.0", port=5000)
@@ -0,0 +1,125 @@
+"""Cliente del modelo: límite de tasa, concurrencia acotada, reintentos y deadline.
+
+Es sincrónico y thread-safe: los workers de gunicorn (gthread) atienden cada
+solicitud en un hilo. LLM_RPM y LLM_RAFAGA son del servicio entero y se reparten
+entre los workers (gunicorn.conf.py exporta la cantidad en WEB_CONCURRENCY);
+LLM_MAX_CONCURRENCIA es por worker.
+"""
+
+import os
+import random
+import threading
+import time
+
+import openai
+from openai import OpenAI
+
+
+#config
+
+# permite apuntar a un servidor compatible (p. ej. stub_llm.py para pruebas de carga)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))          # segundos por intento
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "90"))        # segundos en total, con reintentos
+LLM_REINTENTOS = int(os.getenv("LLM_REINTENTOS", "4"))
+LLM_ESPERA_BASE = float(os.getenv("LLM_ESPERA_BASE", "1"))   # se duplica por intento
+LLM_MAX_CONCURRENCIA = int(os.getenv("LLM_MAX_CONCURRENCIA", "4"))  # por worker
+LLM_RPM = float(os.getenv("LLM_RPM", "60"))                  # solicitudes por minuto, todo el servicio
+LLM_RAFAGA = int(os.getenv("LLM_RAFAGA", "5"))               # solicitudes seguidas permitidas, todo el servicio
+
+_WORKERS = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+
+
+class LLMError(Exception):
+    """El modelo no respondió; status es el código HTTP a devolver al cliente."""
+
+    def __init__(self, mensaje, status=502):
+        super().__init__(mensaje)
+        self.status = status
+
+
+class TokenBucket:
+    """Limitador de tasa: `tasa` tokens por segundo con capacidad para `capacidad` seguidos."""
+
+    def __init__(self, tasa: float, capacidad: int):
+        self.tasa = tasa
+        self.capacidad = capacidad
+        self._tokens = float(capacidad)
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def tomar(self, limite: float) -> bool:
+        """Espera un token hasta el instante `limite` (time.monotonic); False si no llegó."""
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultimo) * self.tasa)
+                self._ultimo = ahora
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                espera = (1 - self._tokens) / self.tasa
+            if ahora + espera > limite:
+                return False
+            time.sleep(espera)
+
+
+_client = OpenAI(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    base_url=OPENAI_BASE_URL,
+    timeout=LLM_TIMEOUT,
+    max_retries=0,  # los reintentos se hacen acá, con jitter y respetando el deadline
+)
+_bucket = TokenBucket(LLM_RPM / 60.0 / _WORKERS, max(1, LLM_RAFAGA // _WORKERS))
+_en_curso = threading.BoundedSemaphore(LLM_MAX_CONCURRENCIA)
+
+# errores transitorios: se reintentan
+_REINTENTABLES = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+def completar(**kwargs):
+    """Llama a chat.completions.create con los límites del módulo; devuelve la respuesta.
+
+    Lanza LLMError con status 503 si se agota el deadline o los reintentos por
+    saturación (el cliente puede reintentar más tarde) y 502 ante otros errores.
+    """
+    limite = time.monotonic() + LLM_DEADLINE
+    ultimo_error = None
+    for intento in range(LLM_REINTENTOS + 1):
+        if not _bucket.tomar(limite):
+            raise LLMError("Límite de solicitudes al modelo alcanzado", 503)
+        restante = limite - time.monotonic()
+        if restante <= 0 or not _en_curso.acquire(timeout=restante):
+            raise LLMError("El modelo no respondió a tiempo", 503)
+        try:
+            restante = limite - time.monotonic()
+            return _client.chat.completions.create(timeout=min(LLM_TIMEOUT, max(restante, 0.1)), **kwargs)
+        except _REINTENTABLES as e:
+            ultimo_error = e
+        except openai.APIError as e:
+            raise LLMError(f"Error del modelo: {e}", 502) from e
+        finally:
+            _en_curso.release()
+
+        espera = _espera(ultimo_error, intento)
+        if time.monotonic() + espera >= limite:
+            break
+        time.sleep(espera)
+
+    raise LLMError(f"El modelo no respondió: {ultimo_error}", 503) from ultimo_error
+
+
+def _espera(error, intento: int) -> float:
+    """Retry-After del servidor si lo indica; si no, backoff exponencial con jitter."""
+    response = getattr(error, "response", None)
+    if response is not None:
+        try:
+            return float(response.headers["retry-after"])
+        except (KeyError, ValueError):
+            pass
+    return LLM_ESPERA_BASE * 2 ** intento * random.uniform(0.5, 1.5)
@@ -0,0 +1,103 @@
+import io
+import os
+from dataclasses import dataclass
+
+from PIL import Image, ImageOps
+
+
+#config
+
+def _flag(nombre, default):
+    return os.getenv(nombre, default).strip().lower() in ("1", "true", "si", "yes")
+
+
+OCR_PRE_EXIF = _flag("OCR_PRE_EXIF", "1")
+OCR_PRE_GRIS = _flag("OCR_PRE_GRIS", "1")
+OCR_PRE_ENDEREZAR = _flag("OCR_PRE_ENDEREZAR", "1")
+OCR_PRE_BINARIZAR = _flag("OCR_PRE_BINARIZAR", "0")
+OCR_PRE_MAX_LADO = int(os.getenv("OCR_PRE_MAX_LADO", "2000"))  # 0 = sin reducir
+OCR_PRE_CALIDAD_JPEG = int(os.getenv("OCR_PRE_CALIDAD_JPEG", "80"))
+
+# búsqueda de inclinación: ±5° en pasos de 0.5°, sobre una miniatura
+_MAX_INCLINACION = 5.0
+_PASO_INCLINACION = 0.5
+_LADO_MUESTRA = 800
+
+
+@dataclass
+class ImagenNormalizada:
+    imagen: Image.Image  # para Tesseract
+    jpeg: bytes          # para el modelo (image_url)
+
+
+def preparar(file_bytes: bytes) -> ImagenNormalizada:
+    """Normaliza una foto una sola vez; OCR y modelo usan el mismo resultado."""
+    imagen = Image.open(io.BytesIO(file_bytes))
+
+    if OCR_PRE_EXIF:
+        imagen = ImageOps.exif_transpose(imagen)
+    imagen = imagen.convert("L" if OCR_PRE_GRIS or OCR_PRE_BINARIZAR else "RGB")
+
+    # primero se reduce: el resto de los pasos trabaja sobre menos píxeles
+    if OCR_PRE_MAX_LADO and max(imagen.size) > OCR_PRE_MAX_LADO:
+        imagen.thumbnail((OCR_PRE_MAX_LADO, OCR_PRE_MAX_LADO), Image.LANCZOS)
+
+    if OCR_PRE_ENDEREZAR:
+        imagen = _enderezar(imagen)
+    if OCR_PRE_BINARIZAR:
+        umbral = _umbral_otsu(imagen)
+        imagen = imagen.point(lambda p: 255 if p > umbral else 0)
+
+    buffer = io.BytesIO()
+    imagen.save(buffer, format="JPEG", quality=OCR_PRE_CALIDAD_JPEG, optimize=True)
+    return ImagenNormalizada(imagen, buffer.getvalue())
+
+
+def _enderezar(imagen: Image.Image) -> Image.Image:
+    angulo = _angulo_inclinacion(imagen)
+    if abs(angulo) < _PASO_INCLINACION:
+        return imagen
+    fondo = 255 if imagen.mode == "L" else (255, 255, 255)
+    return imagen.rotate(angulo, resample=Image.BICUBIC, expand=True, fillcolor=fondo)
+
+
+def _angulo_inclinacion(imagen: Image.Image) -> float:
+    """Ángulo que maximiza la varianza del perfil horizontal (renglones alineados)."""
+    muestra = ImageOps.invert(imagen.convert("L"))
+    muestra.thumbnail((_LADO_MUESTRA, _LADO_MUESTRA))
+
+    mejor_angulo, mejor_score = 0.0, -1.0
+    pasos = int(_MAX_INCLINACION / _PASO_INCLINACION)
+    for i in range(-pasos, pasos + 1):
+        angulo = i * _PASO_INCLINACION
+        rotada = muestra.rotate(angulo, resample=Image.BILINEAR, fillcolor=0)
+        # reducir a 1 px de ancho con BOX deja el promedio de cada renglón
+        perfil = list(rotada.resize((1, rotada.height), Image.BOX).getdata())
+        media = sum(perfil) / len(perfil)
+        score = sum((v - media) ** 2 for v in perfil)
+        if score > mejor_score:
+            mejor_angulo, mejor_score = angulo, score
+    return mejor_angulo
+
+
+def _umbral_otsu(imagen: Image.Image) -> int:
+    histograma = imagen.histogram()[:256]
+    total = sum(histograma)
+    suma_total = sum(i * h for i, h in enumerate(histograma))
+
+    suma_fondo, peso_fondo = 0.0, 0
+    mejor_umbral, mejor_varianza = 127, 0.0
+    for i, h in enumerate(histograma):
+        peso_fondo += h
+        if peso_fondo == 0:
+            continue
+        peso_frente = total - peso_fondo
+        if peso_frente == 0:
+            break
+        suma_fondo += i * h
+        media_fondo = suma_fondo / peso_fondo
+        media_frente = (suma_total - suma_fondo) / peso_frente
+        varianza = peso_fondo * peso_frente * (media_fondo - media_frente) ** 2
+        if varianza > mejor_varianza:
+            mejor_umbral, mejor_varianza = i, varianza
+    return mejor_umbral
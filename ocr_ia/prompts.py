@@ -0,0 +1,205 @@
+"""Armado de los mensajes para el modelo.
+
+Las instrucciones son fijas por tipo de documento (van en el mensaje de
+sistema) y el formato de salida lo impone un JSON schema, así no hacen falta
+ejemplos en prosa. Del texto OCR solo se envían los renglones relevantes
+(encabezado, importes y palabras clave como TOTAL, Fecha o CUIT).
+"""
+
+import hashlib
+import json
+import os
+import re
+
+try:
+    import tiktoken
+except ImportError:  # opcional: sin tiktoken los tokens se estiman
+    tiktoken = None
+
+from factura import CATEGORIAS
+
+
+#config
+
+# renglones del encabezado que siempre se envían (ahí suele estar el emisor)
+PROMPT_RENGLONES_ENCABEZADO = int(os.getenv("PROMPT_RENGLONES_ENCABEZADO", "6"))
+# renglones vecinos que acompañan a cada renglón con una palabra clave
+PROMPT_CONTEXTO = int(os.getenv("PROMPT_CONTEXTO", "1"))
+PROMPT_MAX_CHARS = int(os.getenv("PROMPT_MAX_CHARS", "4000"))
+# con imagen, el texto OCR completo duplica lo que el modelo ya ve: solo se mandan los renglones clave
+PROMPT_OCR_CON_IMAGEN = os.getenv("PROMPT_OCR_CON_IMAGEN", "1").strip().lower() in ("1", "true", "si", "yes")
+
+
+SYSTEM_PROMPT = "Eres un analizador de facturas. Extraes datos reales del documento, sin inventar."
+
+INSTRUCCIONES = {
+    "factura": """Extrae de la factura:
+- proveedor: empresa o comercio emisor.
+- fecha: fecha de emisión (junto a "Fecha", "Emisión", "Fecha de compra"), DD/MM/YYYY. Ignora vencimiento y entrega. Nunca uses la fecha actual; si no estás seguro, "".
+- total: importe junto a "TOTAL", "TOTAL A PAGAR", "IMPORTE FINAL"; 0 si no se entiende.
+- items: productos o conceptos visibles con su precio.
+- categoria: Delivery incluye PedidosYa y Rappi.""",
+    "transferencia": """Es un comprobante de transferencia bancaria. Extrae:
+- proveedor: texto exacto de "Titular cuenta destino" (o "Destinatario"/"Beneficiario"). Nunca el banco (Santander, Galicia, BBVA...).
+- fecha: "Fecha de ejecución", DD/MM/YYYY.
+- total: "Importe debitado" como número.
+- items: [{"nombre": "Transferencia bancaria", "precio": total}].
+- categoria: "Otros" (la categoría por destinatario se asigna después, con reglas).""",
+}
+
+ESQUEMA = {
+    "type": "object",
+    "properties": {
+        "proveedor": {"type": "string"},
+        "fecha": {"type": "string", "description": "DD/MM/YYYY o vacío"},
+        "total": {"type": "number"},
+        "items": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"nombre": {"type": "string"}, "precio": {"type": "number"}},
+                "required": ["nombre", "precio"],
+                "additionalProperties": False,
+            },
+        },
+        "categoria": {"type": "string", "enum": list(CATEGORIAS)},
+    },
+    "required": ["proveedor", "fecha", "total", "items", "categoria"],
+    "additionalProperties": False,
+}
+
+FORMATO_RESPUESTA = {
+    "type": "json_schema",
+    "json_schema": {"name": "factura", "strict": True, "schema": ESQUEMA},
+}
+
+# cambia si cambian las instrucciones o el esquema (forma parte de la clave del cache)
+VERSION = hashlib.sha256(
+    json.dumps([SYSTEM_PROMPT, INSTRUCCIONES, ESQUEMA], sort_keys=True).encode("utf-8")
+).hexdigest()[:16]
+
+
+_CLAVES = re.compile(
+    r"total|importe|monto|fecha|emisi[oó]n|cuit|cuil|raz[oó]n\s+social|titular|destin|beneficiario"
+    r"|factura|ticket|comprobante|subtotal|iva|\$",
+    re.IGNORECASE,
+)
+# renglones con un importe (ítems y totales)
+_IMPORTE = re.compile(r"\d,\d{2}\b|\d\.\d{2}\b")
+# renglones sin valor para la extracción
+_RELLENO = re.compile(
+    r"^[\W_]*$|gracias\s+por\s+su\s+compra|conserve\s+este|www\.|https?://|defensa\s+del\s+consumidor",
+    re.IGNORECASE,
+)
+
+
+_OMITIDOS = "[...]"
+
+
+def _desde_los_extremos(indices, renglones, limite):
+    """Índices que entran en limite caracteres tomando alternadamente del principio
+    y del final: lo que se descarta es el medio (ítems), no el cierre con el TOTAL."""
+    inicio, fin = [], []
+    usados = len(_OMITIDOS) + 1
+    a, b = 0, len(indices) - 1
+    while a <= b:
+        desde_inicio = len(inicio) <= len(fin)
+        i = indices[a] if desde_inicio else indices[b]
+        largo = len(renglones[i]) + 1
+        if usados + largo > limite:
+            break
+        usados += largo
+        if desde_inicio:
+            inicio.append(i)
+            a += 1
+        else:
+            fin.append(i)
+            b -= 1
+    return inicio + fin[::-1]
+
+
+def recortar(texto: str) -> str:
+    """Deja el encabezado, los renglones con importes y los que tienen palabras clave
+    (más sus vecinos), sin espacios repetidos ni renglones duplicados.
+
+    Si no entra en PROMPT_MAX_CHARS se descartan primero los renglones que solo
+    tienen un importe (ítems), desde el medio del bloque; los de encabezado y
+    palabras clave (TOTAL, Fecha, CUIT...) se conservan.
+    """
+    renglones = []
+    for renglon in texto.splitlines():
+        renglon = re.sub(r"\s+", " ", renglon).strip()
+        if len(renglon) >= 2 and not _RELLENO.search(renglon):
+            renglones.append(renglon)
+
+    claves = set(range(min(PROMPT_RENGLONES_ENCABEZADO, len(renglones))))
+    importes = set()
+    for i, renglon in enumerate(renglones):
+        if _CLAVES.search(renglon):
+            claves.update(range(max(0, i - PROMPT_CONTEXTO), min(len(renglones), i + PROMPT_CONTEXTO + 1)))
+        elif _IMPORTE.search(renglon):
+            importes.add(i)
+
+    elegidos, vistos = [], set()
+    for i in sorted(claves | importes):
+        clave = renglones[i].lower()
+        if clave not in vistos:
+            vistos.add(clave)
+            elegidos.append(i)
+    if len("\n".join(renglones[i] for i in elegidos)) <= PROMPT_MAX_CHARS:
+        return "\n".join(renglones[i] for i in elegidos)
+
+    prioritarios = [i for i in elegidos if i in claves]
+    largo = sum(len(renglones[i]) + 1 for i in prioritarios)
+    if largo + len(_OMITIDOS) + 1 <= PROMPT_MAX_CHARS:
+        resto = [i for i in elegidos if i not in claves]
+        conservados = set(prioritarios) | set(_desde_los_extremos(resto, renglones, PROMPT_MAX_CHARS - largo))
+    else:
+        conservados = set(_desde_los_extremos(prioritarios, renglones, PROMPT_MAX_CHARS))
+
+    # una sola marca, donde empieza lo omitido
+    resultado, marcado = [], False
+    for i in elegidos:
+        if i in conservados:
+            resultado.append(renglones[i])
+        elif not marcado:
+            resultado.append(_OMITIDOS)
+            marcado = True
+    return "\n".join(resultado)[:PROMPT_MAX_CHARS]
+
+
+def mensajes(tipo_documento: str, texto: str, imagen_jpeg_b64: str = None) -> list:
+    """Mensajes para chat.completions: instrucciones fijas + contenido del documento."""
+    sistema = f"{SYSTEM_PROMPT}\n\n{INSTRUCCIONES[tipo_documento]}"
+    relevante = recortar(texto)
+
+    if imagen_jpeg_b64 is None:
+        contenido = [{"type": "text", "text": f"Texto del documento:\n{relevante}"}]
+    else:
+        contenido = []
+        if PROMPT_OCR_CON_IMAGEN and relevante:
+            contenido.append({"type": "text", "text": f"Renglones clave leídos por OCR:\n{relevante}"})
+        contenido.append({"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{imagen_jpeg_b64}"}})
+
+    return [
+        {"role": "system", "content": sistema},
+        {"role": "user", "content": contenido},
+    ]
+
+
+def contar_tokens(modelo: str, msgs: list) -> int:
+    """Tokens de texto de los mensajes (las imágenes no se cuentan)."""
+    textos = []
+    for m in msgs:
+        if isinstance(m["content"], str):
+            textos.append(m["content"])
+        else:
+            textos.extend(p["text"] for p in m["content"] if p["type"] == "text")
+    texto = "\n".join(textos)
+    if tiktoken is None:
+        return len(texto) // 4
+    try:
+        codificador = tiktoken.encoding_for_model(modelo)
+    except KeyError:
+        codificador = tiktoken.get_encoding("o200k_base")
+    return len(codificador.encode(texto))
@@ -0,0 +1,184 @@
+"""Registro del texto extraído en logs_ocr, fuera del camino de la solicitud.
+
+registrar() solo encola la fila; un hilo por worker las escribe en lotes
+(una sentencia cada OCR_LOGS_LOTE filas u OCR_LOGS_INTERVALO segundos). Si la
+base no responde o la cola se llena, las filas se descartan: el registro
+nunca frena ni hace fallar una solicitud.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+
+#config
+
+OCR_LOGS = os.getenv("OCR_LOGS", "1").strip().lower() in ("1", "true", "si", "yes")
+OCR_LOGS_LOTE = int(os.getenv("OCR_LOGS_LOTE", "50"))
+OCR_LOGS_INTERVALO = float(os.getenv("OCR_LOGS_INTERVALO", "2"))
+OCR_LOGS_MAX_PENDIENTES = int(os.getenv("OCR_LOGS_MAX_PENDIENTES", "1000"))
+
+DB_USER = os.getenv("DB_USER", "admin")
+DB_PASSWORD = os.getenv("DB_PASS", "admin123")
+DB_NAME = os.getenv("DB_NAME", "facturas_db")
+DB_HOST = os.getenv("DB_HOST", "db_facturas")
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+
+
+logger = logging.getLogger("ocr_ia.registro")
+
+_COLUMNAS = (
+    "chat_id", "archivo_hash", "nombre_archivo", "tipo_documento", "proveedor_detectado",
+    "texto_ocr", "texto_capa", "tiempos", "resultado", "prompt_version", "fuente",
+)
+_COLUMNAS_SQL = ", ".join(_COLUMNAS)
+
+# errores propios de una fila (el resto del lote se puede guardar)
+_ERRORES_DE_FILA = (psycopg2.DataError, psycopg2.IntegrityError, ValueError)
+
+_pendientes = queue.Queue(maxsize=OCR_LOGS_MAX_PENDIENTES)
+_hilo = None
+_hilo_lock = threading.Lock()
+_detener = threading.Event()
+
+
+def conectar():
+    return psycopg2.connect(
+        dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD, host=DB_HOST,
+        connect_timeout=DB_CONNECT_TIMEOUT,
+    )
+
+
+def _sin_nul(valor):
+    """Postgres no acepta NUL en TEXT ni en JSONB (la capa de texto de algunos PDF los trae)."""
+    if isinstance(valor, str):
+        return valor.replace("\x00", "")
+    if isinstance(valor, dict):
+        return {_sin_nul(k): _sin_nul(v) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [_sin_nul(v) for v in valor]
+    return valor
+
+
+def registrar(archivo_hash, nombre_archivo, tipo_documento, texto_ocr, texto_capa, tiempos,
+              resultado, prompt_version, fuente="ocr_ia", chat_id=None):
+    """Encola una fila de logs_ocr; no bloquea.
+
+    Sin chat_id la fila no se vincula con ninguna factura (el mismo archivo
+    puede estar cargado en varios chats).
+    """
+    if not OCR_LOGS:
+        return
+    _iniciar()
+    resultado = _sin_nul(resultado)
+    proveedor = (resultado or {}).get("proveedor") or None
+    fila = (
+        chat_id, archivo_hash, _sin_nul(nombre_archivo), tipo_documento, proveedor[:100] if proveedor else None,
+        _sin_nul(texto_ocr), _sin_nul(texto_capa) or None, json.dumps(tiempos),
+        json.dumps(resultado, ensure_ascii=False), prompt_version, fuente,
+        chat_id, archivo_hash,  # para buscar factura_id
+    )
+    try:
+        _pendientes.put_nowait(fila)
+    except queue.Full:
+        logger.warning("cola de logs_ocr llena: se descarta el registro de %s", nombre_archivo)
+
+
+def ultimo_texto(archivo_hash, chat_id=None):
+    """(texto_ocr, nombre_archivo) del último registro del archivo (del chat, si se indica), o None."""
+    conn = conectar()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT texto_ocr, nombre_archivo
+                FROM logs_ocr
+                WHERE archivo_hash = %s AND texto_ocr IS NOT NULL
+                  AND (%s::bigint IS NULL OR chat_id = %s)
+                ORDER BY fecha DESC
+                LIMIT 1;
+            """, (archivo_hash, chat_id, chat_id))
+            return cursor.fetchone()
+    finally:
+        conn.close()
+
+
+def _iniciar():
+    # el hilo se crea en el proceso worker (después del fork de gunicorn) y se recrea si murió
+    global _hilo
+    if _hilo is None or not _hilo.is_alive():
+        with _hilo_lock:
+            if (_hilo is None or not _hilo.is_alive()) and not _detener.is_set():
+                _hilo = threading.Thread(target=_escritor, name="logs_ocr", daemon=True)
+                _hilo.start()
+
+
+def _escritor():
+    conn = None
+    while not (_detener.is_set() and _pendientes.empty()):
+        lote = _tomar_lote()
+        if not lote:
+            continue
+        try:
+            if conn is None or conn.closed:
+                conn = conectar()
+            try:
+                _escribir(conn, lote)
+            except _ERRORES_DE_FILA:
+                # una fila inválida no descarta el lote: se reintenta de a una
+                for fila in lote:
+                    try:
+                        _escribir(conn, [fila])
+                    except _ERRORES_DE_FILA as e:
+                        logger.error("registro de logs_ocr descartado (%s): %s", fila[2], e)
+        except Exception as e:
+            # cualquier error termina acá: el hilo no debe morir
+            logger.error("no se pudieron guardar %d registros en logs_ocr: %s", len(lote), e)
+            if conn is not None:
+                conn.close()
+            conn = None
+    if conn is not None:
+        conn.close()
+
+
+def _tomar_lote():
+    """Espera la primera fila y junta las que lleguen hasta completar el lote o el intervalo."""
+    try:
+        lote = [_pendientes.get(timeout=OCR_LOGS_INTERVALO)]
+    except queue.Empty:
+        return []
+    limite = time.monotonic() + OCR_LOGS_INTERVALO
+    while len(lote) < OCR_LOGS_LOTE and not _detener.is_set():
+        restante = limite - time.monotonic()
+        if restante <= 0:
+            break
+        try:
+            lote.append(_pendientes.get(timeout=restante))
+        except queue.Empty:
+            break
+    return lote
+
+
+def _escribir(conn, lote):
+    with conn:
+        with conn.cursor() as cursor:
+            # factura_id se completa si el bot ya guardó la factura; si no, lo hace el trigger de facturas
+            execute_values(cursor, f"""
+                INSERT INTO logs_ocr ({_COLUMNAS_SQL}, factura_id)
+                VALUES %s;
+            """, lote, template=(
+                "(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, "
+                "(SELECT id FROM facturas WHERE chat_id = %s AND archivo_hash = %s))"
+            ), page_size=OCR_LOGS_LOTE)
+
+
+def cerrar(espera: float = 5.0):
+    """Escribe lo pendiente y detiene el hilo (al terminar el worker)."""
+    _detener.set()
+    if _hilo is not None:
+        _hilo.join(timeout=espera)
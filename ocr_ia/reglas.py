@@ -0,0 +1,193 @@
+"""Reglas de tipo de documento y de categoría/proveedor, definidas en reglas.json.
+
+Todas las frases de un ámbito ("texto" del OCR o nombre del "proveedor") se
+cargan en un autómata de Aho-Corasick, así cada texto se recorre una vez sin
+importar cuántas reglas haya. El archivo se relee solo cuando cambia
+(se revisa cada REGLAS_RECARGA segundos): agregar un destinatario no requiere
+redeploy.
+
+Cada regla tiene "frases" (alcanza con una) o "todas" (deben aparecer todas) y
+su efecto: "tipo", "categoria" (opcionalmente condicionada con "si_categoria")
+o "proveedor" (nombre que reemplaza al detectado). Gana la primera regla que
+coincide, en el orden del archivo.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+
+#config
+
+REGLAS_PATH = os.getenv("REGLAS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "reglas.json"))
+REGLAS_RECARGA = float(os.getenv("REGLAS_RECARGA", "5"))  # segundos entre chequeos del archivo
+
+
+logger = logging.getLogger("ocr_ia.reglas")
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas, sin tildes y con los espacios colapsados."""
+    texto = unicodedata.normalize("NFKD", texto or "")
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", texto).strip().lower()
+
+
+def _es_palabra(c: str) -> bool:
+    return c.isalnum() or c == "_"
+
+
+class _Automata:
+    """Aho-Corasick: informa todas las frases que aparecen, también las que
+    empiezan o terminan en la misma posición ("titular cuenta" dentro de
+    "titular cuenta destino")."""
+
+    def __init__(self, frases):
+        self._hijos = [{}]
+        self._falla = [0]
+        self._salidas = [[]]
+        for frase in frases:
+            nodo = 0
+            for c in frase:
+                if c not in self._hijos[nodo]:
+                    self._hijos.append({})
+                    self._falla.append(0)
+                    self._salidas.append([])
+                    self._hijos[nodo][c] = len(self._hijos) - 1
+                nodo = self._hijos[nodo][c]
+            self._salidas[nodo].append(frase)
+
+        # enlaces de falla por niveles (BFS); cada nodo hereda las salidas de su falla
+        pendientes = list(self._hijos[0].values())
+        while pendientes:
+            siguientes = []
+            for nodo in pendientes:
+                for c, hijo in self._hijos[nodo].items():
+                    siguientes.append(hijo)
+                    if nodo == 0:
+                        continue  # primer nivel: la falla es la raíz
+                    falla = self._falla[nodo]
+                    while falla and c not in self._hijos[falla]:
+                        falla = self._falla[falla]
+                    self._falla[hijo] = self._hijos[falla].get(c, 0)
+                    self._salidas[hijo] = self._salidas[hijo] + self._salidas[self._falla[hijo]]
+            pendientes = siguientes
+
+    def buscar(self, texto: str) -> set:
+        """Frases que aparecen en el texto como palabras completas."""
+        encontradas = set()
+        nodo = 0
+        for fin, c in enumerate(texto):
+            while nodo and c not in self._hijos[nodo]:
+                nodo = self._falla[nodo]
+            nodo = self._hijos[nodo].get(c, 0)
+            for frase in self._salidas[nodo]:
+                inicio = fin - len(frase) + 1
+                if _es_palabra(frase[0]) and inicio > 0 and _es_palabra(texto[inicio - 1]):
+                    continue
+                if _es_palabra(frase[-1]) and fin + 1 < len(texto) and _es_palabra(texto[fin + 1]):
+                    continue
+                encontradas.add(frase)
+        return encontradas
+
+
+@dataclass
+class Regla:
+    frases: Tuple[str, ...]
+    todas: bool
+    tipo: Optional[str] = None
+    categoria: Optional[str] = None
+    si_categoria: Optional[str] = None
+    proveedor: Optional[str] = None
+
+    def coincide(self, encontradas) -> bool:
+        if self.todas:
+            return all(f in encontradas for f in self.frases)
+        return any(f in encontradas for f in self.frases)
+
+
+class Ambito:
+    """Reglas de un ámbito con todas sus frases en un solo autómata."""
+
+    def __init__(self, definiciones: List[dict]):
+        self.reglas = []
+        for d in definiciones:
+            frases = d.get("todas") or d.get("frases") or []
+            self.reglas.append(Regla(
+                frases=tuple(normalizar(f) for f in frases),
+                todas="todas" in d,
+                tipo=d.get("tipo"),
+                categoria=d.get("categoria"),
+                si_categoria=d.get("si_categoria"),
+                proveedor=d.get("proveedor"),
+            ))
+        self._automata = _Automata({f for r in self.reglas for f in r.frases if f})
+
+    def buscar(self, texto: str) -> List[Regla]:
+        """Reglas que coinciden con el texto, en orden de prioridad."""
+        encontradas = self._automata.buscar(normalizar(texto))
+        if not encontradas:
+            return []
+        return [r for r in self.reglas if r.coincide(encontradas)]
+
+
+class Reglas:
+    def __init__(self, definiciones: Dict[str, List[dict]]):
+        self.texto = Ambito(definiciones.get("texto", []))
+        self.proveedor = Ambito(definiciones.get("proveedor", []))
+
+
+_vigentes = None
+_mtime = None
+_ultimo_chequeo = 0.0
+_lock = threading.Lock()
+
+
+def _cargar() -> Reglas:
+    """Reglas vigentes; recarga el archivo si cambió desde la última vez."""
+    global _vigentes, _mtime, _ultimo_chequeo
+    ahora = time.monotonic()
+    if _vigentes is not None and ahora - _ultimo_chequeo < REGLAS_RECARGA:
+        return _vigentes
+    with _lock:
+        if _vigentes is not None and ahora - _ultimo_chequeo < REGLAS_RECARGA:
+            return _vigentes
+        _ultimo_chequeo = ahora
+        try:
+            mtime = os.stat(REGLAS_PATH).st_mtime
+            if mtime != _mtime:
+                with open(REGLAS_PATH, encoding="utf-8") as f:
+                    _vigentes = Reglas(json.load(f))
+                _mtime = mtime
+                logger.info("reglas cargadas desde %s", REGLAS_PATH)
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            # archivo ausente o mal escrito: se siguen usando las reglas anteriores
+            logger.error("no se pudieron cargar las reglas de %s: %s", REGLAS_PATH, e)
+            if _vigentes is None:
+                _vigentes = Reglas({})
+    return _vigentes
+
+
+def tipo_documento(texto: str) -> str:
+    """'transferencia' o 'factura' según las reglas del ámbito "texto"."""
+    for regla in _cargar().texto.buscar(texto):
+        if regla.tipo:
+            return regla.tipo
+    return "factura"
+
+
+def clasificar(proveedor: str, categoria: str) -> Tuple[str, str]:
+    """Aplica las reglas del ámbito "proveedor"; devuelve (proveedor, categoria)."""
+    nuevo_proveedor = nueva_categoria = None
+    for regla in _cargar().proveedor.buscar(proveedor):
+        if nueva_categoria is None and regla.categoria and regla.si_categoria in (None, categoria):
+            nueva_categoria = regla.categoria
+        if nuevo_proveedor is None and regla.proveedor:
+            nuevo_proveedor = regla.proveedor
+    return nuevo_proveedor or proveedor, nueva_categoria or categoria
@@ -0,0 +1,76 @@
+"""Servidor falso compatible con /v1/chat/completions, para pruebas de carga sin costo.
+
+Uso:
+    python stub_llm.py                      # escucha en :8000
+    OPENAI_BASE_URL=http://localhost:8000/v1 gunicorn -c gunicorn.conf.py invoice_ai_service:app
+
+STUB_LATENCIA fija la demora de cada respuesta (segundos) y STUB_TASA_429 la
+proporción de solicitudes que responden 429, para ver reintentos y throughput.
+Las primeras STUB_PRIMERAS_429 solicitudes responden siempre 429 (pruebas de
+reintentos sin azar).
+"""
+
+import json
+import os
+import random
+import threading
+import time
+import uuid
+
+from flask import Flask, jsonify, request
+
+
+#config
+
+STUB_PUERTO = int(os.getenv("STUB_PUERTO", "8000"))
+STUB_LATENCIA = float(os.getenv("STUB_LATENCIA", "1.0"))
+STUB_TASA_429 = float(os.getenv("STUB_TASA_429", "0"))
+STUB_RETRY_AFTER = os.getenv("STUB_RETRY_AFTER", "1")
+STUB_PRIMERAS_429 = int(os.getenv("STUB_PRIMERAS_429", "0"))
+
+
+app = Flask(__name__)
+
+solicitudes = 0
+_lock = threading.Lock()
+
+RESPUESTA = {
+    "proveedor": "Comercio de Prueba",
+    "fecha": "12/09/2024",
+    "total": 4532.40,
+    "items": [{"nombre": "Producto", "precio": 4532.40}],
+    "categoria": "Supermercado",
+}
+
+
+@app.route("/v1/chat/completions", methods=["POST"])
+def chat_completions():
+    global solicitudes
+    with _lock:
+        solicitudes += 1
+        forzar_429 = solicitudes <= STUB_PRIMERAS_429
+    if forzar_429 or random.random() < STUB_TASA_429:
+        response = jsonify({"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}})
+        response.status_code = 429
+        response.headers["Retry-After"] = STUB_RETRY_AFTER
+        return response
+
+    time.sleep(STUB_LATENCIA)
+    body = request.get_json(silent=True) or {}
+    contenido = json.dumps(RESPUESTA)
+    return jsonify({
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": contenido},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 0, "completion_tokens": len(contenido) // 4, "total_tokens": len(contenido) // 4},
+    })
+
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=STUB_PUERTO, threaded=True)
@@ -0,0 +1,58 @@
+from datetime import date, timedelta
+
+import pytest
+
+import factura
+
+
+@pytest.mark.parametrize("valor, esperado", [
+    (4532.4, 4532.4),
+    (10, 10.0),
+    ("199.968,00", 199968.0),
+    ("199968,00", 199968.0),
+    ("1,234.56", 1234.56),
+    ("$ 4532.40", 4532.4),
+    ("14.691", 14691.0),
+    ("1.234.567", 1234567.0),
+    ("1,234", 1234.0),
+    ("1234,5", 1234.5),
+    ("", 0.0),
+    (None, 0.0),
+    ("sin importe", 0.0),
+])
+def test_parse_importe(valor, esperado):
+    assert factura.parse_importe(valor) == esperado
+
+
+@pytest.mark.parametrize("valor, esperado", [
+    ("12/03/2024", date(2024, 3, 12)),
+    ("12-03-24", date(2024, 3, 12)),
+    ("2024-03-12", date(2024, 3, 12)),
+    (date(2024, 3, 12), date(2024, 3, 12)),
+    ("31/02/2024", None),
+    ("12/03/1999", None),
+    (date.today(), None),
+    (None, None),
+])
+def test_parse_fecha(valor, esperado):
+    assert factura.parse_fecha(valor) == esperado
+
+
+def test_parse_fecha_futura():
+    assert factura.parse_fecha(date.today() + timedelta(days=1)) is None
+
+
+def test_desde_respuesta_normaliza():
+    f = factura.desde_respuesta(
+        '```json\n{"proveedor": " Carrefour ", "fecha": "12/03/2024", "total": "4.532,40",'
+        ' "categoria": "supermercado", "items": [{"nombre": "Pan", "precio": "250"}]}\n```'
+    )
+    assert f.a_dict() == {
+        "proveedor": "Carrefour", "fecha": "2024-03-12", "total": 4532.4, "categoria": "Supermercado",
+        "items": [{"nombre": "Pan", "precio": 250.0}], "origen": "modelo",
+    }
+
+
+def test_desde_respuesta_invalida():
+    with pytest.raises(factura.RespuestaInvalida):
+        factura.desde_respuesta("no es json")
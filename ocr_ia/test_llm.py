@@ -0,0 +1,85 @@
+import importlib
+import threading
+
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("flask")
+
+from werkzeug.serving import make_server
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    import stub_llm
+    monkeypatch.setattr(stub_llm, "STUB_LATENCIA", 0)
+    monkeypatch.setattr(stub_llm, "STUB_TASA_429", 0)
+    monkeypatch.setattr(stub_llm, "solicitudes", 0)
+    servidor = make_server("127.0.0.1", 0, stub_llm.app, threaded=True)
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    yield stub_llm, f"http://127.0.0.1:{servidor.server_port}/v1"
+    servidor.shutdown()
+
+
+@pytest.fixture
+def llm(stub, monkeypatch):
+    _, url = stub
+    monkeypatch.setenv("OPENAI_BASE_URL", url)
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("LLM_RPM", "6000")
+    monkeypatch.setenv("LLM_RAFAGA", "100")
+    import llm
+    return importlib.reload(llm)
+
+
+def _completar(llm):
+    return llm.completar(model="stub", messages=[{"role": "user", "content": "hola"}])
+
+
+def test_reintenta_tras_429(stub, llm, monkeypatch):
+    stub_llm, _ = stub
+    monkeypatch.setattr(stub_llm, "STUB_PRIMERAS_429", 2)
+    monkeypatch.setattr(stub_llm, "STUB_RETRY_AFTER", "0")
+
+    esperas = []
+    espera_original = llm._espera
+
+    def espera(error, intento):
+        esperas.append(espera_original(error, intento))
+        return esperas[-1]
+
+    monkeypatch.setattr(llm, "_espera", espera)
+    respuesta = _completar(llm)
+
+    assert "Comercio de Prueba" in respuesta.choices[0].message.content
+    assert stub_llm.solicitudes == 3
+    assert esperas == [0.0, 0.0]  # respeta el Retry-After del servidor
+
+
+def test_429_persistente_agota_reintentos(stub, llm, monkeypatch):
+    stub_llm, _ = stub
+    monkeypatch.setattr(stub_llm, "STUB_PRIMERAS_429", 100)
+    monkeypatch.setattr(stub_llm, "STUB_RETRY_AFTER", "0")
+    monkeypatch.setattr(llm, "LLM_REINTENTOS", 2)
+
+    with pytest.raises(llm.LLMError) as error:
+        _completar(llm)
+    assert error.value.status == 503
+    assert stub_llm.solicitudes == 3
+
+
+def test_backoff_exponencial_con_jitter(llm, monkeypatch):
+    monkeypatch.setattr(llm, "LLM_ESPERA_BASE", 1.0)
+    for intento in range(4):
+        espera = llm._espera(Exception("sin respuesta"), intento)
+        assert 0.5 * 2 ** intento <= espera <= 1.5 * 2 ** intento
+
+
+def test_rpm_se_reparte_entre_workers(llm, monkeypatch):
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    monkeypatch.setenv("LLM_RPM", "120")
+    monkeypatch.setenv("LLM_RAFAGA", "8")
+    llm = importlib.reload(llm)
+    assert llm._bucket.tasa == pytest.approx(120 / 60 / 4)
+    assert llm._bucket.capacidad == 2
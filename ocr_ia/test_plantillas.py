@@ -0,0 +1,60 @@
+from datetime import date
+
+import plantillas
+
+
+COMPROBANTE = (
+    "Comprobante de transferencia Fecha de ejecución: 12/03/2024 "
+    "Titular cuenta destino: Gabriela Menno CUIT 27-12345678-9 "
+    "Importe debitado $ {importe} Concepto Varios"
+)
+
+
+def test_transferencia_con_separadores():
+    resultado, confianza = plantillas.transferencia(COMPROBANTE.format(importe="199.968,00"))
+    assert resultado["proveedor"] == "Gabriela Menno"
+    assert resultado["total"] == 199968.0
+    assert resultado["fecha"] == date(2024, 3, 12)
+    assert confianza == 1.0
+
+
+def test_transferencia_sin_separador_de_miles():
+    resultado, _ = plantillas.transferencia(COMPROBANTE.format(importe="199968,00"))
+    assert resultado["total"] == 199968.0
+
+
+def test_transferencia_importe_entero():
+    resultado, _ = plantillas.transferencia(COMPROBANTE.format(importe="14691"))
+    assert resultado["total"] == 14691.0
+
+
+def test_transferencia_sin_importe_no_alcanza():
+    resultado, confianza = plantillas.transferencia("Titular cuenta destino: Gabriela Menno CUIT 1")
+    assert resultado is None
+    assert confianza < plantillas.OCR_REGLAS_MIN_CONFIANZA
+
+
+def test_transferencia_banco_no_es_destinatario():
+    resultado, _ = plantillas.transferencia("Destinatario: Santander Importe debitado $ 100,00")
+    assert resultado is None
+
+
+def test_transferencia_titular_no_incluye_el_monto():
+    resultado, _ = plantillas.transferencia(
+        "Destinatario Juan Perez Monto $ 1.500 Fecha 03/10/2025 Número de operación 99"
+    )
+    assert resultado["proveedor"] == "Juan Perez"
+    assert resultado["total"] == 1500.0
+
+
+def test_transferencia_titular_con_cifras_no_alcanza():
+    resultado, confianza = plantillas.transferencia("Beneficiario 1.500 Importe debitado $ 1.500,00")
+    assert resultado is None
+    assert confianza < plantillas.OCR_REGLAS_MIN_CONFIANZA
+
+
+def test_transferencia_conserva_punto_de_razon_social():
+    resultado, _ = plantillas.transferencia(
+        "Titular cuenta destino: GRUPO ZAFCHE S.A. CUIT 30-12345678-9 Importe debitado $ 10.000,00"
+    )
+    assert resultado["proveedor"] == "GRUPO ZAFCHE S.A."
@@ -0,0 +1,41 @@
+import prompts
+
+
+def _ticket(items, precio="$ 1.250,00"):
+    encabezado = ["SUPERMERCADO EJEMPLO S.A.", "CUIT 30-12345678-9", "Fecha: 12/03/2024"]
+    renglones = [f"PRODUCTO NUMERO {n:03d} x1 {n},50" for n in range(items)]
+    cierre = ["SUBTOTAL 99.999,00", "TOTAL $ 123.456,78", "Gracias por su compra"]
+    return "\n".join(encabezado + renglones + cierre)
+
+
+def test_recortar_sin_recorte():
+    texto = prompts.recortar(_ticket(5))
+    assert "TOTAL $ 123.456,78" in texto
+    assert "PRODUCTO NUMERO 004 x1 4,50" in texto
+    assert "Gracias" not in texto
+
+
+def test_recortar_conserva_total_pasado_el_limite():
+    original = _ticket(400)
+    assert original.index("TOTAL $") > prompts.PROMPT_MAX_CHARS
+
+    texto = prompts.recortar(original)
+    assert len(texto) <= prompts.PROMPT_MAX_CHARS
+    assert "TOTAL $ 123.456,78" in texto
+    assert "SUBTOTAL 99.999,00" in texto
+    assert "CUIT 30-12345678-9" in texto
+    assert "Fecha: 12/03/2024" in texto
+    # se descartan ítems del medio, no los primeros ni los últimos
+    assert "PRODUCTO NUMERO 000 x1 0,50" in texto
+    assert "PRODUCTO NUMERO 399 x1 399,50" in texto
+    assert "PRODUCTO NUMERO 200 x1 200,50" not in texto
+    assert texto.count(prompts._OMITIDOS) == 1
+
+
+def test_recortar_todo_clave_conserva_el_cierre():
+    # ítems con "$" también son renglones clave: se corta igual desde el medio
+    renglones = ["COMERCIO"] + [f"Item {n} $ {n},00" for n in range(500)] + ["TOTAL $ 9.999,00"]
+    texto = prompts.recortar("\n".join(renglones))
+    assert len(texto) <= prompts.PROMPT_MAX_CHARS
+    assert texto.startswith("COMERCIO")
+    assert texto.endswith("TOTAL $ 9.999,00")
@@ -0,0 +1,46 @@
+import reglas
+
+
+def _ambito(*definiciones):
+    return reglas.Ambito(list(definiciones))
+
+
+def test_frases_que_empiezan_en_la_misma_posicion():
+    ambito = _ambito(
+        {"frases": ["titular cuenta destino"], "tipo": "transferencia"},
+        {"frases": ["titular cuenta"], "tipo": "otro"},
+    )
+    assert [r.tipo for r in ambito.buscar("Titular cuenta destino: Juan")] == ["transferencia", "otro"]
+
+
+def test_todas_con_frases_superpuestas():
+    ambito = _ambito(
+        {"frases": ["santander comprobante de transferencia"], "tipo": "x"},
+        {"todas": ["comprobante", "santander"], "tipo": "transferencia"},
+    )
+    assert "transferencia" in [r.tipo for r in ambito.buscar("Santander comprobante de transferencia")]
+
+
+def test_gana_el_orden_del_archivo():
+    ambito = _ambito(
+        {"frases": ["cons"], "categoria": "Expensas"},
+        {"frases": ["cons ed"], "categoria": "Otros"},
+    )
+    assert ambito.buscar("Cons Ed Mistica")[0].categoria == "Expensas"
+
+
+def test_solo_palabras_completas_y_sin_tildes():
+    ambito = _ambito({"frases": ["mistica"], "categoria": "Expensas"})
+    assert ambito.buscar("Ed. Mística")
+    assert not ambito.buscar("misticas")
+    assert not ambito.buscar("desmistica")
+
+
+def test_todas_exige_cada_frase():
+    ambito = _ambito({"todas": ["santander", "comprobante"], "tipo": "transferencia"})
+    assert not ambito.buscar("Santander recibo")
+    assert ambito.buscar("comprobante Santander")
+
+
+def test_ambito_vacio():
+    assert _ambito().buscar("cualquier texto") == []
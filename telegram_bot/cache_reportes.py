@@ -0,0 +1,87 @@
+import os
+import time
+from collections import OrderedDict
+
+
+#config
+
+REPORT_CACHE_MAX_BYTES = int(os.getenv("REPORT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+# vencimiento de cada reporte: cubre las cargas que no pasan por el bot (importar.py,
+# recalcular_gastos.py) y por lo tanto no lo invalidan
+REPORT_CACHE_TTL = float(os.getenv("REPORT_CACHE_TTL", "300"))
+
+
+class CacheReportes:
+    """LRU de reportes ya renderizados (PNG + texto de detalle).
+
+    Cada entrada se asocia a los períodos que cubre, p. ej. (chat_id, "mes", 2025, 10)
+    o (chat_id, "año", 2025); al registrar una factura se invalidan solo esos períodos.
+    Además cada entrada vence a los ttl segundos. Solo se usa desde el event loop,
+    por eso no lleva locks.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entradas = OrderedDict()  # clave -> (png, detalle, periodos, vence)
+        self._por_periodo = {}          # periodo -> set(claves)
+        self._generaciones = {}         # periodo -> contador de invalidaciones
+        self._bytes = 0
+
+    def generacion(self, periodos):
+        """Se toma antes de consultar la base; si cambia, el resultado ya no es válido."""
+        return tuple(self._generaciones.get(p, 0) for p in periodos)
+
+    def obtener(self, clave):
+        entrada = self._entradas.get(clave)
+        if entrada is None:
+            return None
+        if time.monotonic() >= entrada[3]:
+            self._quitar(clave)
+            return None
+        self._entradas.move_to_end(clave)
+        return entrada[0], entrada[1]
+
+    def guardar(self, clave, periodos, generacion, png: bytes, detalle: str):
+        # una factura nueva llegó mientras se generaba el reporte: no se guarda
+        if self.generacion(periodos) != generacion:
+            return
+        tamaño = len(png) + len(detalle)
+        if tamaño > self.max_bytes:
+            return
+        self._quitar(clave)
+        self._entradas[clave] = (png, detalle, tuple(periodos), time.monotonic() + self.ttl)
+        self._bytes += tamaño
+        for periodo in periodos:
+            self._por_periodo.setdefault(periodo, set()).add(clave)
+        while self._bytes > self.max_bytes:
+            self._quitar(next(iter(self._entradas)))
+
+    def invalidar(self, periodos):
+        for periodo in periodos:
+            self._generaciones[periodo] = self._generaciones.get(periodo, 0) + 1
+            for clave in self._por_periodo.pop(periodo, set()):
+                self._quitar(clave)
+
+    def _quitar(self, clave):
+        entrada = self._entradas.pop(clave, None)
+        if entrada is None:
+            return
+        png, detalle, periodos, _ = entrada
+        self._bytes -= len(png) + len(detalle)
+        for periodo in periodos:
+            claves = self._por_periodo.get(periodo)
+            if claves is not None:
+                claves.discard(clave)
+                if not claves:
+                    del self._por_periodo[periodo]
+
+
+reportes = CacheReportes(REPORT_CACHE_MAX_BYTES, REPORT_CACHE_TTL)
+
+
+def periodos_de_fecha(chat_id, fecha):
+    """Períodos de reporte del chat afectados por una factura con esa fecha."""
+    if fecha is None:
+        return []
+    return [(chat_id, "mes", fecha.year, fecha.month), (chat_id, "año", fecha.year)]
@@ -0,0 +1,166 @@
+import os
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+# Forzar backend sin GUI (para matplotlib dentro de Docker)
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.cm as cm
+from matplotlib.figure import Figure
+from matplotlib.ticker import FuncFormatter
+import numpy as np
+
+
+#config
+
+CHART_DPI = int(os.getenv("CHART_DPI", "200"))
+CHART_ESCALA = float(os.getenv("CHART_ESCALA", "1.0"))  # multiplica el tamaño de las figuras
+CHART_WORKERS = int(os.getenv("CHART_WORKERS", "2"))
+
+
+_pool = None
+
+
+def _figura(ancho, alto) -> Figure:
+    # Figure sin pyplot: no hay estado global compartido entre gráficos
+    return Figure(figsize=(ancho * CHART_ESCALA, alto * CHART_ESCALA), dpi=CHART_DPI)
+
+
+def _png(fig: Figure) -> bytes:
+    buffer = BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight", dpi=CHART_DPI)
+    return buffer.getvalue()
+
+
+def grafico_resumen(categorias, valores, mes_nombre) -> bytes:
+    """Gráfico de dona de gastos por categoría de un mes."""
+    total = float(sum(valores))
+
+    colores = ["#FF6B6B", "#FFD93D", "#6BCB77", "#4D96FF", "#C77DFF", "#FF9CEE"][:len(valores)]
+
+    fig = _figura(6.5, 6.5)
+    ax = fig.add_subplot()
+
+    wedges, _ = ax.pie(
+        valores,
+        startangle=90,
+        colors=colores,
+        wedgeprops=dict(width=0.4, edgecolor="white")
+    )
+
+    ax.text(
+        0, 0, f"${total:,.0f}",
+        ha="center", va="center",
+        fontsize=22, fontweight="bold", color="#222"
+    )
+
+    for i, (wedge, valor) in enumerate(zip(wedges, valores)):
+        ang = (wedge.theta2 + wedge.theta1) / 2
+        ang_rad = np.deg2rad(ang)
+
+        radio = 0.8
+        x = radio * np.cos(ang_rad)
+        y = radio * np.sin(ang_rad)
+
+        porcentaje = (valor / total) * 100 if total > 0 else 0
+
+        if porcentaje >= 5:
+            ax.text(
+                x, y,
+                f"{porcentaje:.1f}%",
+                ha="center", va="center",
+                fontsize=10,
+                color="white",
+                fontweight="bold",
+                bbox=dict(boxstyle="round,pad=0.3", facecolor="black", alpha=0.7, edgecolor="none")
+            )
+
+    ax.set_title(
+        f"Gastos por categoría — {mes_nombre}",
+        fontsize=15,
+        fontweight="bold",
+        pad=20
+    )
+
+    etiquetas_leyenda = []
+    for categoria, valor in zip(categorias, valores):
+        porcentaje = (valor / total) * 100 if total > 0 else 0
+        etiquetas_leyenda.append(f"{categoria} ({porcentaje:.1f}%)")
+
+    ax.legend(
+        wedges,
+        etiquetas_leyenda,
+        title="Categorías",
+        loc="lower center",
+        bbox_to_anchor=(0.5, -0.25),
+        fontsize=9.5,
+        title_fontsize=11,
+        ncol=2,
+        frameon=False
+    )
+
+    fig.patch.set_facecolor("white")
+    fig.tight_layout()
+
+    return _png(fig)
+
+
+def grafico_resumen_general(meses_labels, gastos_totales, año_objetivo) -> bytes:
+    """Gráfico de barras de gastos por mes de un año."""
+    fig = _figura(12, 7)
+    ax = fig.add_subplot()
+
+    colores = cm.viridis(np.linspace(0, 1, len(gastos_totales)))
+
+    bars = ax.bar(meses_labels, gastos_totales, color=colores, edgecolor='white', linewidth=0.7)
+
+    for bar, valor in zip(bars, gastos_totales):
+        height = bar.get_height()
+        ax.text(bar.get_x() + bar.get_width()/2., height + max(gastos_totales)*0.01,
+               f'${valor:,.0f}', ha='center', va='bottom', fontsize=9, fontweight='bold')
+
+    # personalización del gráfico
+    ax.set_title(f"Gastos Mensuales - {año_objetivo}", fontsize=16, fontweight="bold", pad=20)
+    ax.set_ylabel("Gastos ($)", fontsize=12, fontweight="bold")
+    ax.set_xlabel("Mes", fontsize=12, fontweight="bold")
+
+    # rotar etiquetas del eje X si hay muchos meses
+    if len(meses_labels) > 6:
+        for etiqueta in ax.get_xticklabels():
+            etiqueta.set_rotation(45)
+            etiqueta.set_ha('right')
+
+    ax.grid(axis='y', alpha=0.3, linestyle='--')
+    ax.set_axisbelow(True)
+
+    ax.yaxis.set_major_formatter(FuncFormatter(lambda x, p: f'${x:,.0f}'))
+
+    fig.patch.set_facecolor("white")
+    fig.tight_layout()
+
+    return _png(fig)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=CHART_WORKERS,
+            mp_context=multiprocessing.get_context("forkserver"),
+        )
+    return _pool
+
+
+async def render(grafico, *args) -> bytes:
+    """Renderiza un gráfico en el pool de procesos sin bloquear el event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_pool(), grafico, *args)
+
+
+def cerrar():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True)
+        _pool = None
@@ -0,0 +1,116 @@
+"""Workers de la cola de ingesta (tabla trabajos_ingesta).
+
+Los handlers encolan el archivo y responden con un acuse; los workers lo
+procesan con reintentos y editan el acuse con el resultado.
+"""
+
+import os
+import random
+import asyncio
+
+from telegram.error import TelegramError
+
+import db
+import ingesta
+import repositorio
+
+
+#config
+
+INGESTA_WORKERS = int(os.getenv("INGESTA_WORKERS", "4"))
+INGESTA_MAX_INTENTOS = int(os.getenv("INGESTA_MAX_INTENTOS", "4"))
+INGESTA_ESPERA_BASE = float(os.getenv("INGESTA_ESPERA_BASE", "15"))  # segundos, se duplica por intento
+INGESTA_LEASE = int(os.getenv("INGESTA_LEASE", "600"))
+INGESTA_POLL = float(os.getenv("INGESTA_POLL", "5"))
+
+
+_despertar = None
+_tareas = []
+
+
+async def encolar(chat_id: int, mensaje_id: int, nombre_archivo: str, mime_type: str, contenido: bytes) -> int:
+    trabajo_id = await db.run(
+        repositorio.encolar_trabajo, chat_id, mensaje_id, nombre_archivo, mime_type, contenido
+    )
+    if _despertar is not None:
+        _despertar.set()
+    return trabajo_id
+
+
+def iniciar(bot):
+    """Lanza los workers (se llama desde post_init de la aplicación)."""
+    global _despertar
+    _despertar = asyncio.Event()
+    for _ in range(INGESTA_WORKERS):
+        _tareas.append(asyncio.create_task(_worker(bot)))
+
+
+async def detener():
+    """Cancela los workers; un trabajo interrumpido se retoma al vencer su lease."""
+    for tarea in _tareas:
+        tarea.cancel()
+    await asyncio.gather(*_tareas, return_exceptions=True)
+    _tareas.clear()
+
+
+async def _worker(bot):
+    while True:
+        try:
+            _despertar.clear()
+            trabajo = await db.run(repositorio.tomar_trabajo, INGESTA_LEASE)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # base no disponible: se reintenta en el próximo ciclo
+            trabajo = None
+
+        if trabajo is None:
+            try:
+                await asyncio.wait_for(_despertar.wait(), INGESTA_POLL)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        try:
+            await _ejecutar(bot, trabajo)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # no se pudo registrar el resultado: el trabajo se retoma al vencer el lease
+            pass
+
+
+async def _ejecutar(bot, trabajo):
+    try:
+        texto = await ingesta.procesar_factura(
+            trabajo["chat_id"], trabajo["contenido"], trabajo["nombre_archivo"], trabajo["mime_type"]
+        )
+        estado = "ok"
+    except ingesta.ErrorTransitorio as e:
+        if trabajo["intentos"] < INGESTA_MAX_INTENTOS:
+            # backoff exponencial con jitter
+            espera = INGESTA_ESPERA_BASE * 2 ** (trabajo["intentos"] - 1) * random.uniform(0.8, 1.2)
+            await db.run(repositorio.reprogramar_trabajo, trabajo["id"], espera, str(e))
+            return
+        texto, estado = str(e), "error"
+    except Exception as e:
+        texto, estado = f"Error al procesar la factura.\nDetalles: {e}", "error"
+
+    await db.run(repositorio.finalizar_trabajo, trabajo["id"], estado, texto)
+    await _responder(bot, trabajo, texto)
+
+
+async def _responder(bot, trabajo, texto):
+    """Edita el acuse con el resultado; si el Markdown no es válido, se envía como texto plano."""
+    for parse_mode in ("Markdown", None):
+        try:
+            if trabajo["mensaje_id"]:
+                await bot.edit_message_text(
+                    texto, chat_id=trabajo["chat_id"], message_id=trabajo["mensaje_id"],
+                    parse_mode=parse_mode,
+                )
+            else:
+                await bot.send_message(trabajo["chat_id"], texto, parse_mode=parse_mode)
+            return
+        except TelegramError:
+            continue
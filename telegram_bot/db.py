@@ -0,0 +1,89 @@
+import os
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+import psycopg2.errors
+from psycopg2.pool import ThreadedConnectionPool
+
+
+#config
+
+DB_USER = os.getenv("DB_USER", "admin")
+DB_PASSWORD = os.getenv("DB_PASS", "admin123")
+DB_NAME = os.getenv("DB_NAME", "facturas_db")
+DB_HOST = os.getenv("DB_HOST", "db_facturas")
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "8"))
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "10000"))
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# un hilo por conexión del pool: nunca se piden más conexiones de las que hay
+_executor = ThreadPoolExecutor(max_workers=DB_POOL_MAX, thread_name_prefix="db")
+
+
+def _get_pool() -> ThreadedConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadedConnectionPool(
+                    DB_POOL_MIN,
+                    DB_POOL_MAX,
+                    host=DB_HOST,
+                    database=DB_NAME,
+                    user=DB_USER,
+                    password=DB_PASSWORD,
+                    connect_timeout=DB_CONNECT_TIMEOUT,
+                    options=f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}",
+                )
+    return _pool
+
+
+def _conexion_rota(error: Exception) -> bool:
+    """True si el error indica que la conexión se perdió (y no un timeout de la query)."""
+    if isinstance(error, psycopg2.errors.QueryCanceled):
+        return False
+    return isinstance(error, (psycopg2.OperationalError, psycopg2.InterfaceError))
+
+
+def ejecutar(fn, *args):
+    """Corre fn(cursor, *args) dentro de una transacción con una conexión del pool.
+
+    Si la conexión estaba caída (por ejemplo, tras reiniciar Postgres) se descarta
+    y se reintenta con otra, hasta renovar todo el pool.
+    """
+    pool = _get_pool()
+    for intento in range(DB_POOL_MAX + 1):
+        conn = pool.getconn()
+        descartar = False
+        try:
+            with conn:
+                with conn.cursor() as cursor:
+                    return fn(cursor, *args)
+        except Exception as e:
+            descartar = _conexion_rota(e) or conn.closed
+            if not descartar or intento == DB_POOL_MAX:
+                raise
+        finally:
+            pool.putconn(conn, close=descartar or bool(conn.closed))
+
+
+async def run(fn, *args):
+    """Versión async de `ejecutar`: la query corre en un hilo y no bloquea el event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, ejecutar, fn, *args)
+
+
+def cerrar():
+    """Cierra todas las conexiones del pool."""
+    global _pool
+    _executor.shutdown(wait=True)
+    if _pool is not None:
+        _pool.closeall()
+        _pool = None
@@ -0,0 +1,18 @@
+import re
+import hashlib
+
+
+def hash_archivo(contenido: bytes) -> str:
+    """sha256 de los bytes subidos: identifica re-envíos del mismo archivo."""
+    return hashlib.sha256(contenido).hexdigest()
+
+
+def huella_factura(proveedor: str, fecha, total: float) -> str:
+    """sha256 de proveedor normalizado + fecha + total.
+
+    Debe coincidir con el cálculo de database/migrations/001_dedup_facturas.sql.
+    """
+    nombre = re.sub(r"\s+", " ", proveedor).strip().lower()
+    fecha_txt = fecha.isoformat() if fecha else ""
+    clave = f"{nombre}|{fecha_txt}|{total:.2f}"
+    return hashlib.sha256(clave.encode("utf-8")).hexdigest()
@@ -0,0 +1,200 @@
+"""Importación masiva de facturas (ZIP desde Telegram o carpeta local).
+
+Los archivos ya cargados se descartan antes del OCR; el resto se manda a
+/process_batch con paralelismo acotado y los resultados se guardan en lotes.
+"""
+
+import io
+import os
+import asyncio
+import zipfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+import db
+import dedup
+import ingesta
+import ocr_client
+import repositorio
+from cache_reportes import reportes, periodos_de_fecha
+
+
+#config
+
+# solicitudes a /process_batch de una importación en curso a la vez, y archivos por solicitud
+IMPORT_PARALELISMO = int(os.getenv("IMPORT_PARALELISMO", "2"))
+IMPORT_ARCHIVOS_POR_SOLICITUD = int(os.getenv("IMPORT_ARCHIVOS_POR_SOLICITUD", "8"))
+# facturas por transacción al guardar
+IMPORT_LOTE = int(os.getenv("IMPORT_LOTE", "25"))
+IMPORT_MAX_ARCHIVOS = int(os.getenv("IMPORT_MAX_ARCHIVOS", "500"))
+# tamaño máximo de un archivo descomprimido (protege contra ZIPs maliciosos)
+IMPORT_MAX_BYTES_ARCHIVO = int(os.getenv("IMPORT_MAX_BYTES_ARCHIVO", str(20 * 1024 * 1024)))
+
+TIPOS = {
+    ".pdf": "application/pdf",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+}
+
+
+# (nombre, mime_type, función que devuelve el contenido)
+Archivo = Tuple[str, str, Callable[[], bytes]]
+
+
+@dataclass
+class Resumen:
+    importadas: int = 0
+    duplicadas: int = 0
+    fallidas: List[Tuple[str, str]] = field(default_factory=list)  # (nombre, motivo)
+
+    def texto(self) -> str:
+        lineas = [
+            "📦 Importación terminada",
+            f"✅ Importadas: {self.importadas}",
+            f"♻️ Duplicadas: {self.duplicadas}",
+            f"❌ Fallidas: {len(self.fallidas)}",
+        ]
+        for nombre, motivo in self.fallidas[:10]:
+            lineas.append(f"• {nombre}: {motivo}")
+        if len(self.fallidas) > 10:
+            lineas.append(f"• ... y {len(self.fallidas) - 10} más")
+        return "\n".join(lineas)
+
+
+def tipo_de(nombre: str) -> Optional[str]:
+    return TIPOS.get(Path(nombre).suffix.lower())
+
+
+def es_zip(nombre: str, mime_type: Optional[str]) -> bool:
+    return (mime_type or "").endswith("zip") or nombre.lower().endswith(".zip")
+
+
+def archivos_de_zip(contenido: bytes) -> List[Archivo]:
+    """Facturas dentro de un ZIP; cada una se descomprime recién al procesarla."""
+    zf = zipfile.ZipFile(io.BytesIO(contenido))
+    archivos = []
+    for info in zf.infolist():
+        nombre = info.filename
+        if info.is_dir() or nombre.startswith("__MACOSX/") or Path(nombre).name.startswith("."):
+            continue
+        mime_type = tipo_de(nombre)
+        if mime_type is None:
+            continue
+        if info.file_size > IMPORT_MAX_BYTES_ARCHIVO:
+            raise ValueError(f"{nombre} supera el tamaño máximo permitido.")
+        archivos.append((Path(nombre).name, mime_type, lambda info=info: zf.read(info)))
+    return archivos
+
+
+def archivos_de_carpeta(carpeta: str) -> List[Archivo]:
+    archivos = []
+    for ruta in sorted(Path(carpeta).rglob("*")):
+        mime_type = tipo_de(ruta.name)
+        if ruta.is_file() and mime_type is not None:
+            archivos.append((ruta.name, mime_type, ruta.read_bytes))
+    return archivos
+
+
+async def importar(chat_id: int, archivos: List[Archivo], progreso=None,
+                   max_archivos: Optional[int] = IMPORT_MAX_ARCHIVOS) -> Resumen:
+    """Importa los archivos y devuelve el resumen.
+
+    Los archivos viajan al OCR en grupos (una solicitud a /process_batch por
+    grupo) y los resultados se van guardando a medida que llegan.
+    progreso(hechos, total) se llama (si se pasa) cada vez que se guarda un lote.
+    """
+    if max_archivos and len(archivos) > max_archivos:
+        raise ValueError(f"Se admiten hasta {max_archivos} archivos por importación.")
+
+    resumen = Resumen()
+    semaforo = asyncio.Semaphore(IMPORT_PARALELISMO)
+    resultados = asyncio.Queue()  # (nombre, factura, motivo de falla); sin factura ni motivo = duplicada
+    vistos = set()  # hashes de esta importación (un mismo archivo repetido en el ZIP)
+
+    async def leer_grupo(grupo: List[Archivo]):
+        informados = set()
+
+        def informar(i, factura=None, motivo=None):
+            informados.add(i)
+            resultados.put_nowait((grupo[i][0], factura, motivo))
+
+        try:
+            async with semaforo:
+                nuevos = []  # (indice en el grupo, contenido, hash)
+                for i, (nombre, _, contenido_de) in enumerate(grupo):
+                    contenido = contenido_de()
+                    archivo_hash = dedup.hash_archivo(contenido)
+                    if archivo_hash in vistos:
+                        informar(i)
+                        continue
+                    vistos.add(archivo_hash)
+                    nuevos.append((i, contenido, archivo_hash))
+
+                existentes = await db.run(repositorio.archivos_existentes, chat_id, [h for _, _, h in nuevos])
+                for i, _, archivo_hash in nuevos:
+                    if archivo_hash in existentes:
+                        informar(i)
+                enviar = [n for n in nuevos if n[2] not in existentes]
+                if not enviar:
+                    return
+
+                lote_ocr = [(grupo[i][0], contenido, grupo[i][1]) for i, contenido, _ in enviar]
+                async for j, data in ocr_client.procesar_lote(lote_ocr, chat_id):
+                    i, _, archivo_hash = enviar[j]
+                    if isinstance(data, ocr_client.OCRError):
+                        informar(i, motivo=str(data))
+                        continue
+                    try:
+                        informar(i, factura=ingesta.interpretar(data, archivo_hash))
+                    except ingesta.DatosInvalidos as e:
+                        informar(i, motivo=str(e))
+        except ocr_client.OCRError as e:
+            motivo = str(e)
+        except Exception as e:
+            motivo = str(e) or type(e).__name__
+        else:
+            motivo = "el OCR no devolvió resultado"
+        # lo que quedó sin respuesta (conexión cortada, error de base, etc.) cuenta como fallido
+        for i in range(len(grupo)):
+            if i not in informados:
+                informar(i, motivo=motivo)
+
+    lote = []
+    hechos = 0
+
+    async def guardar():
+        insertadas = await db.run(repositorio.guardar_facturas, chat_id, lote)
+        resumen.importadas += len(insertadas)
+        resumen.duplicadas += len(lote) - len(insertadas)
+        for factura in lote:
+            if factura.archivo_hash in insertadas:
+                reportes.invalidar(periodos_de_fecha(chat_id, factura.fecha))
+        lote.clear()
+        if progreso is not None:
+            await progreso(hechos, len(archivos))
+
+    grupos = [
+        archivos[i:i + IMPORT_ARCHIVOS_POR_SOLICITUD]
+        for i in range(0, len(archivos), IMPORT_ARCHIVOS_POR_SOLICITUD)
+    ]
+    tareas = [asyncio.ensure_future(leer_grupo(g)) for g in grupos]
+    try:
+        while hechos < len(archivos):
+            nombre, factura, motivo = await resultados.get()
+            hechos += 1
+            if motivo is not None:
+                resumen.fallidas.append((nombre, motivo))
+            elif factura is None:
+                resumen.duplicadas += 1
+            else:
+                lote.append(factura)
+                if len(lote) >= IMPORT_LOTE:
+                    await guardar()
+        if lote:
+            await guardar()
+    finally:
+        for tarea in tareas:
+            tarea.cancel()
+    return resumen
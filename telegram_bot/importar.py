@@ -0,0 +1,38 @@
+"""Importa facturas desde una carpeta local (o un ZIP) sin pasar por Telegram.
+
+Uso: python importar.py <carpeta|archivo.zip> --chat-id <id del chat de Telegram>
+"""
+import argparse
+import asyncio
+from pathlib import Path
+
+import db
+import importacion
+import ocr_client
+
+
+async def main(ruta: str, chat_id: int):
+    if Path(ruta).is_dir():
+        archivos = importacion.archivos_de_carpeta(ruta)
+    else:
+        archivos = importacion.archivos_de_zip(Path(ruta).read_bytes())
+    print(f"📦 {len(archivos)} archivos encontrados.")
+
+    async def progreso(hechos, total):
+        print(f"  {hechos}/{total}")
+
+    try:
+        resumen = await importacion.importar(chat_id, archivos, progreso, max_archivos=None)
+    finally:
+        await ocr_client.cerrar()
+    print(resumen.texto())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importación masiva de facturas.")
+    parser.add_argument("ruta", help="carpeta con PDF/JPG/PNG o archivo .zip")
+    parser.add_argument("--chat-id", type=int, required=True, help="chat de Telegram dueño de las facturas")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.ruta, args.chat_id))
+    db.cerrar()
@@ -0,0 +1,103 @@
+"""Procesamiento de una factura: OCR, normalización y guardado."""
+
+import json
+from datetime import date
+from typing import List, NamedTuple, Optional, Tuple
+
+import psycopg2
+
+import db
+import dedup
+import ocr_client
+import repositorio
+from cache_reportes import reportes, periodos_de_fecha
+
+
+class ErrorTransitorio(Exception):
+    """Falla temporal (OCR o base de datos no disponibles): el trabajo se reintenta."""
+
+
+class DatosInvalidos(Exception):
+    """La respuesta del OCR no sirve para registrar la factura (el mensaje es para el usuario)."""
+
+
+class FacturaLeida(NamedTuple):
+    proveedor: str
+    fecha: Optional[date]
+    total: float
+    categoria: str
+    raw_json: str
+    items: List[Tuple[str, float]]
+    huella: str
+    archivo_hash: str
+
+
+def interpretar(data: dict, archivo_hash: str) -> FacturaLeida:
+    """Arma la factura a partir de la respuesta del OCR; lanza DatosInvalidos si no se puede registrar.
+
+    ocr_ia ya valida y normaliza los campos (fecha ISO o null, importes numéricos),
+    acá no se vuelven a interpretar.
+    """
+    if not all(k in data for k in ("proveedor", "fecha", "total", "categoria")):
+        raise DatosInvalidos("La respuesta del OCR está incompleta.")
+
+    proveedor = data["proveedor"]
+    if proveedor.lower() in ["santander", "galicia", "bbva", "hsbc", "macro", "nación", "provincia"]:
+        raise DatosInvalidos(f"Error: Detecté '{proveedor}' como proveedor. Debería ser el destinatario de la transferencia. Reenvía la imagen.")
+
+    # la categoría por destinatario ya la asignan las reglas de ocr_ia (reglas.json)
+    categoria = data["categoria"]
+    fecha = date.fromisoformat(data["fecha"]) if data["fecha"] else None
+    total = data["total"]
+    items = [(item["nombre"], item["precio"]) for item in data.get("items", [])]
+
+    huella = dedup.huella_factura(proveedor, fecha, total)
+    return FacturaLeida(proveedor, fecha, total, categoria, json.dumps(data), items, huella, archivo_hash)
+
+
+async def procesar_factura(chat_id: int, contenido: bytes, file_name: str, mime_type: str) -> str:
+    """Procesa un archivo (OCR + guardado) y devuelve el mensaje para el usuario.
+
+    Lanza ErrorTransitorio si el OCR o la base no están disponibles.
+    """
+    try:
+        # el mismo archivo ya cargado no vuelve a pasar por el OCR
+        archivo_hash = dedup.hash_archivo(contenido)
+        if await db.run(repositorio.existe_archivo, chat_id, archivo_hash):
+            return "Este archivo ya fue registrado anteriormente."
+
+        try:
+            data = await ocr_client.procesar(contenido, file_name, mime_type, chat_id)
+        except ocr_client.OCRError as e:
+            raise ErrorTransitorio("Error al procesar la factura (OCR no respondió correctamente).") from e
+
+        try:
+            factura = interpretar(data, archivo_hash)
+        except DatosInvalidos as e:
+            return str(e)
+
+        # proveedor, factura e ítems en una sola transacción; la huella descarta duplicados
+        proveedor, fecha, total, categoria = factura.proveedor, factura.fecha, factura.total, factura.categoria
+        factura_id = await db.run(
+            repositorio.guardar_factura, chat_id, proveedor, fecha, total, categoria, factura.raw_json,
+            factura.items, factura.huella, archivo_hash
+        )
+
+        if factura_id is None:
+            fecha_texto = f"del {fecha.strftime('%d/%m/%Y')}" if fecha else "(sin fecha)"
+            return f" La factura de {proveedor} {fecha_texto} ya está registrada."
+
+        # los reportes del período de la factura quedan desactualizados
+        reportes.invalidar(periodos_de_fecha(chat_id, fecha))
+
+        # Resumen para el usuario
+        return (
+            f"🧾 *Factura registrada:*\n"
+            f"🏢 *Proveedor:* {proveedor}\n"
+            f"📅 *Fecha:* {fecha.strftime('%d/%m/%Y') if fecha else '—'}\n"
+            f"💰 *Total:* ${total:,.2f}\n"
+            f"📂 *Categoría:* {categoria}"
+        )
+
+    except psycopg2.OperationalError as e:
+        raise ErrorTransitorio(f"Error al procesar la factura.\nDetalles: {e}") from e
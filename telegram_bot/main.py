@@ -1,31 +1,25 @@
 import os
-import json
-import psycopg2
-import requests
-from datetime import datetime
+import zipfile
+from datetime import datetime, date
 from telegram import Update, InputFile
+from telegram.error import TelegramError
 from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, filters, ContextTypes
-from decimal import Decimal
-
-# Forzar backend sin GUI (para matplotlib dentro de Docker)
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import matplotlib.cm as cm
-import numpy as np
 from io import BytesIO
 
+import charts
+import cola
+import db
+import importacion
+from cache_reportes import reportes
+import ocr_client
+import repositorio
 
 
 #config
 
 BOT_TOKEN = os.getenv("TELEGRAM_TOKEN")
-OCR_URL = os.getenv("OCR_URL", "http://ocr_ia:5000/process")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-DB_USER = os.getenv("DB_USER", "admin")
-DB_PASSWORD = os.getenv("DB_PASS", "admin123")
-DB_NAME = os.getenv("DB_NAME", "facturas_db")
-DB_HOST = os.getenv("DB_HOST", "db_facturas")
+BOT_CONCURRENT_UPDATES = int(os.getenv("BOT_CONCURRENT_UPDATES", "16"))
 
 
 
@@ -34,217 +28,26 @@ if not BOT_TOKEN:
 
 
 
-# db
-conn = psycopg2.connect(
-    host=DB_HOST,
-    database=DB_NAME,
-    user=DB_USER,
-    password=DB_PASSWORD
-)
-conn.autocommit = True
-
-
-
 
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("👋 ¡Hola! Envíame una foto de una factura para procesarla.")
 
 
-def parse_fecha_o_none(fecha_str: str):
-    """Convierte texto de fecha a datetime.date o devuelve None si no es válida."""
-    if not fecha_str:
-        return None
-    formatos = ["%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%d/%m/%y"]
-    for fmt in formatos:
-        try:
-            f = datetime.strptime(fecha_str.strip(), fmt).date()
-            hoy = datetime.today().date()
-            
-            if f >= hoy or f.year < 2000:
-                return None
-            return f
-        except Exception:
-            continue
-    return None
-
-
-def corregir_categoria_transferencia(proveedor: str, categoria_original: str) -> str:
-    """Corrige la categorización basada en el proveedor para transferencias bancarias."""
-    proveedor_lower = proveedor.lower().strip()
-    
-    # Categorías específicas por destinatario
-    if "menno gabriela" in proveedor_lower:
-        return "Alquiler"
-    if "grupo zafche" in proveedor_lower:
-        return "Alquiler"
-    if "cons ed mistica" in proveedor_lower:
-        return "Expensas"
-    if "mistica" in proveedor_lower:
-        return "Expensas"
-    if "calle 7" in proveedor_lower:
-        return "Expensas"
-    if "num 39" in proveedor_lower:
-        return "Expensas"
-    if "ed mistica" in proveedor_lower:
-        return "Expensas"
-    
-    
-    if categoria_original == "Servicios" and any(palabra in proveedor_lower for palabra in ["transferencia", "santander", "galicia"]):
-        return "Otros"
-    
-    
-    if any(word in proveedor_lower for word in ["cons", "consorcio", "edificio", "expensas"]):
-        return "Expensas"
-    
-    return categoria_original
-
-
-def corregir_monto_transferencia(total_original: float) -> float:
-    """Corrige montos mal interpretados por el OCR."""
-    
-    # Si es un monto que parece estar dividido por 10
-    if 10000 <= total_original <= 99999: 
-        return total_original * 10
-    
-    # Si es muy pequeño para una transferencia real
-    elif 1000 <= total_original <= 9999:  # Entre 1k y 9k
-        return total_original * 10
-    
-    # Si es demasiado grande, dividir
-    elif total_original > 1000000:
-        return total_original / 10
-    
-    return total_original
-
-
-async def process_invoice_file(update: Update, file_path: str, file_name: str, mime_type: str):
-    try:
-        
-        response = requests.post(OCR_URL, files={"file": (file_name, open(file_path, "rb"), mime_type)})
-
-        if response.status_code != 200:
-            await update.message.reply_text("Error al procesar la factura (OCR no respondió correctamente).")
-            return
-
-        data = response.json()
-
-        
-        if not all(k in data for k in ("proveedor", "fecha", "total", "categoria")):
-            await update.message.reply_text("La respuesta del OCR está incompleta.")
-            return
-
-        proveedor = data["proveedor"].strip()
-        categoria = data.get("categoria", "Otros")
-
-       
-        
-        if proveedor.lower() in ["santander", "galicia", "bbva", "hsbc", "macro", "nación", "provincia"]:
-
-            await update.message.reply_text(f"Error: Detecté '{proveedor}' como proveedor. Debería ser el destinatario de la transferencia. Reenvía la imagen.")
-            return
-
-        categoria = corregir_categoria_transferencia(proveedor, categoria)
-
-        # Parsear fecha y total
-        fecha = parse_fecha_o_none(data.get("fecha"))
-
-       
-        raw_total = str(data.get("total", "")).strip()
-
-        if raw_total:
-            limpio = raw_total.replace(".", "").replace(",", ".")
-            try:
-                total = float(limpio)
-            except Exception:
-                total = 0.0
-        else:
-            total = 0.0
-
-        
-        total = corregir_monto_transferencia(total)
-
-
-        cursor = conn.cursor()
-
-        # Insertar o reutilizar proveedor
-        cursor.execute("""
-            INSERT INTO proveedores (nombre)
-            VALUES (%s)
-            ON CONFLICT (nombre) DO UPDATE SET nombre = EXCLUDED.nombre
-            RETURNING id;
-        """, (proveedor,))
-        proveedor_id = cursor.fetchone()[0]
-
-        # Evitar duplicados 
-        if fecha is not None:
-            cursor.execute("""
-                SELECT id FROM facturas
-                WHERE proveedor_id = %s AND fecha = %s AND total = %s;
-            """, (proveedor_id, fecha, total))
-        else:
-            cursor.execute("""
-                SELECT id FROM facturas
-                WHERE proveedor_id = %s AND fecha IS NULL AND total = %s;
-            """, (proveedor_id, total))
-
-        if cursor.fetchone():
-            fecha_texto = f"del {fecha.strftime('%d/%m/%Y')}" if fecha else "(sin fecha)"
-            await update.message.reply_text(
-                f" La factura de {proveedor} {fecha_texto} ya está registrada."
-            )
-            cursor.close()
-            return
-
-        # Insertar factura
-        cursor.execute("""
-            INSERT INTO facturas (proveedor_id, fecha, total, categoria, raw_json)
-            VALUES (%s, %s, %s, %s, %s)
-            RETURNING id;
-        """, (proveedor_id, fecha, total, categoria, json.dumps(data)))
-        factura_id = cursor.fetchone()[0]
-
-        # Insertar ítems
-        if "items" in data and isinstance(data["items"], list):
-            for item in data["items"]:
-                descripcion = item.get("nombre", "Sin descripción")
-                precio = item.get("precio", 0)
-                try:
-                    precio = float(str(precio).replace(",", "."))
-                except:
-                    precio = 0.0
-
-                cursor.execute("""
-                    INSERT INTO items (factura_id, descripcion, precio_total)
-                    VALUES (%s, %s, %s);
-                """, (factura_id, descripcion, precio))
-
-        cursor.close()
-
-        # Resumen para el usuario
-        resumen = (
-            f"🧾 *Factura registrada:*\n"
-            f"🏢 *Proveedor:* {proveedor}\n"
-            f"📅 *Fecha:* {fecha.strftime('%d/%m/%Y') if fecha else '—'}\n"
-            f"💰 *Total:* ${total:,.2f}\n"
-            f"📂 *Categoría:* {categoria}"
-        )
-        await update.message.reply_text(resumen, parse_mode="Markdown")
-
-    except Exception as e:
-        import traceback
-
-        await update.message.reply_text(f"Error al procesar la factura.\nDetalles: {e}")
+#handlers
+async def encolar_factura(update: Update, contenido: bytes, file_name: str, mime_type: str):
+    """Responde enseguida con un acuse; un worker de la cola lo edita con el resultado."""
+    acuse = await update.message.reply_text("📥 Factura recibida, procesando...")
+    await cola.encolar(update.effective_chat.id, acuse.message_id, file_name, mime_type, contenido)
 
 
-#handlers
 async def handle_invoice(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         photo = update.message.photo[-1]
         file = await photo.get_file()
-        file_path = "/tmp/factura.jpg"
-        await file.download_to_drive(file_path)
-        await process_invoice_file(update, file_path, "factura.jpg", "image/jpeg")
+        # descarga en memoria: cada mensaje tiene su propio buffer, sin archivos compartidos en /tmp
+        contenido = bytes(await file.download_as_bytearray())
+        await encolar_factura(update, contenido, "factura.jpg", "image/jpeg")
     except Exception as e:
         import traceback
 
@@ -253,14 +56,16 @@ async def handle_invoice(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         document = update.message.document
-        if not document.mime_type.startswith("application/pdf"):
-            await update.message.reply_text("Solo se admiten archivos PDF.")
+        if importacion.es_zip(document.file_name or "", document.mime_type):
+            await handle_zip(update, document)
+            return
+        if not (document.mime_type or "").startswith("application/pdf"):
+            await update.message.reply_text("Solo se admiten archivos PDF o ZIP.")
             return
 
         file = await document.get_file()
-        file_path = f"/tmp/{document.file_name}"
-        await file.download_to_drive(file_path)
-        await process_invoice_file(update, file_path, document.file_name, "application/pdf")
+        contenido = bytes(await file.download_as_bytearray())
+        await encolar_factura(update, contenido, document.file_name or "factura.pdf", "application/pdf")
     except Exception as e:
         import traceback
 
@@ -269,19 +74,46 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 
+async def handle_zip(update: Update, document):
+    """Importación masiva: un ZIP con facturas (PDF/JPG/PNG) y un único resumen al final."""
+    file = await document.get_file()
+    contenido = bytes(await file.download_as_bytearray())
+    try:
+        archivos = importacion.archivos_de_zip(contenido)
+    except (zipfile.BadZipFile, ValueError) as e:
+        await update.message.reply_text(f"No pude leer el ZIP.\nDetalles: {e}")
+        return
+    if not archivos:
+        await update.message.reply_text("El ZIP no contiene facturas (PDF, JPG o PNG).")
+        return
+    if importacion.IMPORT_MAX_ARCHIVOS and len(archivos) > importacion.IMPORT_MAX_ARCHIVOS:
+        await update.message.reply_text(
+            f"El ZIP tiene {len(archivos)} archivos; se admiten hasta "
+            f"{importacion.IMPORT_MAX_ARCHIVOS} por importación."
+        )
+        return
+
+    acuse = await update.message.reply_text(f"📦 Importando {len(archivos)} archivos...")
+
+    async def progreso(hechos, total):
+        try:
+            await acuse.edit_text(f"📦 Importando... {hechos}/{total}")
+        except TelegramError:
+            pass
+
+    try:
+        resumen = await importacion.importar(update.effective_chat.id, archivos, progreso)
+    except Exception as e:
+        # lo ya guardado queda guardado; reenviar el ZIP completa el resto (los duplicados se saltean)
+        await acuse.edit_text(f"❌ La importación se interrumpió.\nDetalles: {e}")
+        return
+    await acuse.edit_text(resumen.texto())
+
+
 #conmandos
 
 async def gastos(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT p.nombre, SUM(f.total)
-        FROM facturas f
-        JOIN proveedores p ON p.id = f.proveedor_id
-        GROUP BY p.nombre
-        ORDER BY SUM(f.total) DESC;
-    """)
-    rows = cursor.fetchall()
-    cursor.close()
+    rows = await db.run(repositorio.gastos_por_proveedor, update.effective_chat.id)
 
     if rows:
         text = " *Gasto por proveedor:*\n"
@@ -292,11 +124,14 @@ async def gastos(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(" No hay datos registrados aún.")
 
 
+async def enviar_reporte(update: Update, png: bytes, filename: str, detalle: str):
+    await update.message.reply_photo(photo=InputFile(BytesIO(png), filename=filename))
+    await update.message.reply_text(detalle, parse_mode="Markdown")
+
+
 async def resumen(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    chat_id = update.effective_chat.id
     try:
-        cursor = conn.cursor()
-
-        
         meses = {
             "Enero": 1, "Febrero": 2, "Marzo": 3, "Abril": 4, "Mayo": 5, "Junio": 6,
             "Julio": 7, "Agosto": 8, "Septiembre": 9, "Octubre": 10,
@@ -309,7 +144,6 @@ async def resumen(update: Update, context: ContextTypes.DEFAULT_TYPE):
             mes_num = meses.get(mes_nombre)
             if not mes_num:
                 await update.message.reply_text("Mes no válido. Ejemplo: /resumen Octubre")
-                cursor.close()
                 return
         else:
             # si no se especifica mes, usar el mes actual
@@ -317,19 +151,33 @@ async def resumen(update: Update, context: ContextTypes.DEFAULT_TYPE):
             mes_num = mes_actual
             mes_nombre = [k for k, v in meses.items() if v == mes_num][0]
 
-        # totales por categoría
-        cursor.execute("""
-            SELECT categoria, SUM(total)
-            FROM facturas
-            WHERE EXTRACT(MONTH FROM fecha) = %s
-            GROUP BY categoria
-            ORDER BY SUM(total) DESC;
-        """, (mes_num,))
-        rows = cursor.fetchall()
-        cursor.close()
+        # año opcional: /resumen Octubre 2024 (por defecto el año actual)
+        if len(args) > 1:
+            try:
+                año = int(args[1])
+            except ValueError:
+                await update.message.reply_text("Año no válido. Ejemplo: /resumen Octubre 2025")
+                return
+        else:
+            año = datetime.now().year
+
+        # reporte ya generado y sin facturas nuevas en el período
+        clave_cache = ("resumen", chat_id, año, mes_num)
+        periodos = [(chat_id, "mes", año, mes_num)]
+        cacheado = reportes.obtener(clave_cache)
+        if cacheado:
+            png, detalle = cacheado
+            await enviar_reporte(update, png, f"resumen_{mes_nombre}_{año}.png", detalle)
+            return
+        generacion = reportes.generacion(periodos)
+
+        # totales por categoría del mes: rango [desde, hasta) para usar el índice por fecha
+        desde = date(año, mes_num, 1)
+        hasta = date(año + 1, 1, 1) if mes_num == 12 else date(año, mes_num + 1, 1)
+        rows = await db.run(repositorio.totales_por_categoria, chat_id, desde, hasta)
 
         if not rows:
-            await update.message.reply_text(f"No hay facturas registradas para {mes_nombre}.")
+            await update.message.reply_text(f"No hay facturas registradas para {mes_nombre} {año}.")
             return
 
         
@@ -355,89 +203,8 @@ async def resumen(update: Update, context: ContextTypes.DEFAULT_TYPE):
         categorias = list(normalizados.keys())
         valores = list(normalizados.values())
 
-        total = float(sum(valores))
-
-        
-        colores = ["#FF6B6B", "#FFD93D", "#6BCB77", "#4D96FF", "#C77DFF", "#FF9CEE"][:len(valores)]
-
-        #grafico
-        fig, ax = plt.subplots(figsize=(6.5, 6.5), dpi=200)
-
-        wedges, _ = ax.pie(
-            valores,
-            startangle=90,
-            colors=colores,
-            wedgeprops=dict(width=0.4, edgecolor="white")
-        )
-
-        
-        ax.text(
-            0, 0, f"${total:,.0f}",
-            ha="center", va="center",
-            fontsize=22, fontweight="bold", color="#222"
-        )
-
-        
-        for i, (wedge, valor) in enumerate(zip(wedges, valores)):
-            ang = (wedge.theta2 + wedge.theta1) / 2
-            ang_rad = np.deg2rad(ang)
-            
-            
-            radio = 0.8  
-            x = radio * np.cos(ang_rad)
-            y = radio * np.sin(ang_rad)
-            
-            porcentaje = (valor / total) * 100 if total > 0 else 0
-            
-            
-            if porcentaje >= 5:
-                ax.text(
-                    x, y,
-                    f"{porcentaje:.1f}%",
-                    ha="center", va="center",
-                    fontsize=10,
-                    color="white",
-                    fontweight="bold",
-                    bbox=dict(boxstyle="round,pad=0.3", facecolor="black", alpha=0.7, edgecolor="none")
-                )
-
-        
-        ax.set_title(
-            f"Gastos por categoría — {mes_nombre}",
-            fontsize=15,
-            fontweight="bold",
-            pad=20
-        )
-
-        
-        etiquetas_leyenda = []
-        for categoria, valor in zip(categorias, valores):
-            porcentaje = (valor / total) * 100 if total > 0 else 0
-            etiquetas_leyenda.append(f"{categoria} ({porcentaje:.1f}%)")
-            
-        ax.legend(
-            wedges,
-            etiquetas_leyenda,
-            title="Categorías",
-            loc="lower center",
-            bbox_to_anchor=(0.5, -0.25),
-            fontsize=9.5,
-            title_fontsize=11,
-            ncol=2,
-            frameon=False
-        )
-
-        fig.patch.set_facecolor("white")
-        plt.tight_layout()
-
-        # guardar imagen
-        buffer = BytesIO()
-        plt.savefig(buffer, format="png", bbox_inches="tight", dpi=200)
-        buffer.seek(0)
-        plt.close(fig)
-
-        # enviar gráfico
-        await update.message.reply_photo(photo=InputFile(buffer, filename=f"resumen_{mes_nombre}.png"))
+        # el gráfico se renderiza en el pool de procesos
+        png = await charts.render(charts.grafico_resumen, categorias, valores, f"{mes_nombre} {año}")
 
         
         emoji_map = {
@@ -451,12 +218,13 @@ async def resumen(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "Petshop": "🐈"
         }
 
-        detalle = f"📋 *Detalle de gastos — {mes_nombre}:*\n"
+        detalle = f"📋 *Detalle de gastos — {mes_nombre} {año}:*\n"
         for categoria, valor in zip(categorias, valores):
             emoji = emoji_map.get(categoria, "📦")
             detalle += f"{emoji} {categoria}: ${valor:,.0f}\n"
 
-        await update.message.reply_text(detalle, parse_mode="Markdown")
+        reportes.guardar(clave_cache, periodos, generacion, png, detalle)
+        await enviar_reporte(update, png, f"resumen_{mes_nombre}_{año}.png", detalle)
 
     except Exception as e:
         import traceback
@@ -466,10 +234,8 @@ async def resumen(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def resumen_general(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    chat_id = update.effective_chat.id
     try:
-        cursor = conn.cursor()
-
-        
         meses_nombres = {
             1: "Enero", 2: "Febrero", 3: "Marzo", 4: "Abril", 5: "Mayo", 6: "Junio",
             7: "Julio", 8: "Agosto", 9: "Septiembre", 10: "Octubre", 11: "Noviembre", 12: "Diciembre"
@@ -482,22 +248,25 @@ async def resumen_general(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 año_objetivo = int(args[0])
             except ValueError:
                 await update.message.reply_text("Año no válido. Ejemplo: /resumen_general 2025")
-                cursor.close()
                 return
         else:
             # si no se especifica año, usar el año actual
             año_objetivo = datetime.now().year
 
+        # reporte ya generado y sin facturas nuevas en el año
+        clave_cache = ("resumen_general", chat_id, año_objetivo)
+        periodos = [(chat_id, "año", año_objetivo)]
+        cacheado = reportes.obtener(clave_cache)
+        if cacheado:
+            png, detalle = cacheado
+            await enviar_reporte(update, png, f"gastos_mensuales_{año_objetivo}.png", detalle)
+            return
+        generacion = reportes.generacion(periodos)
+
         # gastos totales por mes del año especificado
-        cursor.execute("""
-            SELECT EXTRACT(MONTH FROM fecha) as mes, SUM(total)
-            FROM facturas
-            WHERE fecha IS NOT NULL AND EXTRACT(YEAR FROM fecha) = %s
-            GROUP BY EXTRACT(MONTH FROM fecha)
-            ORDER BY mes;
-        """, (año_objetivo,))
-        rows = cursor.fetchall()
-        cursor.close()
+        rows = await db.run(
+            repositorio.totales_por_mes, chat_id, date(año_objetivo, 1, 1), date(año_objetivo + 1, 1, 1)
+        )
 
         if not rows:
             await update.message.reply_text(f"No hay facturas registradas para el año {año_objetivo}.")
@@ -513,46 +282,7 @@ async def resumen_general(update: Update, context: ContextTypes.DEFAULT_TYPE):
             gastos_totales.append(float(total))
 
         #  gráfico de barras
-        fig, ax = plt.subplots(figsize=(12, 7), dpi=200)
-        
-        
-        colores = plt.cm.viridis(np.linspace(0, 1, len(gastos_totales)))
-        
-        bars = ax.bar(meses_labels, gastos_totales, color=colores, edgecolor='white', linewidth=0.7)
-        
-        
-        for bar, valor in zip(bars, gastos_totales):
-            height = bar.get_height()
-            ax.text(bar.get_x() + bar.get_width()/2., height + max(gastos_totales)*0.01,
-                   f'${valor:,.0f}', ha='center', va='bottom', fontsize=9, fontweight='bold')
-
-        # personalización del gráfico 
-        ax.set_title(f"Gastos Mensuales - {año_objetivo}", fontsize=16, fontweight="bold", pad=20)
-        ax.set_ylabel("Gastos ($)", fontsize=12, fontweight="bold")
-        ax.set_xlabel("Mes", fontsize=12, fontweight="bold")
-        
-        # rotar etiquetas del eje X si hay muchos meses
-        if len(meses_labels) > 6:
-            plt.xticks(rotation=45, ha='right')
-        
-       
-        ax.grid(axis='y', alpha=0.3, linestyle='--')
-        ax.set_axisbelow(True)
-        
-        
-        ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'${x:,.0f}'))
-        
-        fig.patch.set_facecolor("white")
-        plt.tight_layout()
-
-        
-        buffer = BytesIO()
-        plt.savefig(buffer, format="png", bbox_inches="tight", dpi=200)
-        buffer.seek(0)
-        plt.close(fig)
-
-        
-        await update.message.reply_photo(photo=InputFile(buffer, filename=f"gastos_mensuales_{año_objetivo}.png"))
+        png = await charts.render(charts.grafico_resumen_general, meses_labels, gastos_totales, año_objetivo)
 
         # resumen estadístico del historial
         total_general = sum(gastos_totales)
@@ -575,7 +305,8 @@ async def resumen_general(update: Update, context: ContextTypes.DEFAULT_TYPE):
             f"💚 Menor gasto: ${minimo_mes:,.0f} ({mes_menor_gasto})"
         )
 
-        await update.message.reply_text(detalle, parse_mode="Markdown")
+        reportes.guardar(clave_cache, periodos, generacion, png, detalle)
+        await enviar_reporte(update, png, f"gastos_mensuales_{año_objetivo}.png", detalle)
 
     except Exception as e:
         await update.message.reply_text(f"Error al generar el resumen general.\nDetalles: {e}")
@@ -587,7 +318,7 @@ async def mensaje_no_reconocido(update: Update, context: ContextTypes.DEFAULT_TY
     comandos = (
         "⚙️ *Comandos disponibles:*\n"
         "/start — Inicia el bot\n"
-        "/resumen [mes] — Gráfico pastel de gastos (mes actual por defecto)\n"
+        "/resumen [mes] [año] — Gráfico pastel de gastos (mes actual por defecto)\n"
         "/resumen_general [año] — Gastos mensuales del año (año actual por defecto)\n"
         "/gastos — Gasto por proveedor\n\n"
         "💡 También podés enviar una *foto o PDF de una factura* para procesarla."
@@ -599,8 +330,27 @@ async def comando_desconocido(update: Update, context: ContextTypes.DEFAULT_TYPE
     await mensaje_no_reconocido(update, context)
 
 
+async def on_startup(application):
+    cola.iniciar(application.bot)
+
+
+async def on_shutdown(application):
+    await cola.detener()
+    await ocr_client.cerrar()
+    db.cerrar()
+    charts.cerrar()
+
+
 if __name__ == "__main__":
-    app = ApplicationBuilder().token(BOT_TOKEN).build()
+    # concurrent_updates: cada chat se atiende sin esperar a que termine la factura de otro
+    app = (
+        ApplicationBuilder()
+        .token(BOT_TOKEN)
+        .concurrent_updates(BOT_CONCURRENT_UPDATES)
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+        .build()
+    )
 
    
     app.add_handler(CommandHandler("start", start))
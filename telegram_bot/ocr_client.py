@@ -0,0 +1,124 @@
+import os
+import json
+import asyncio
+import httpx
+
+
+#config
+
+OCR_URL = os.getenv("OCR_URL", "http://ocr_ia:5000/process")
+OCR_BATCH_URL = os.getenv("OCR_BATCH_URL", OCR_URL.rsplit("/", 1)[0] + "/process_batch")
+OCR_CONNECT_TIMEOUT = float(os.getenv("OCR_CONNECT_TIMEOUT", "5"))
+OCR_READ_TIMEOUT = float(os.getenv("OCR_READ_TIMEOUT", "120"))
+OCR_MAX_CONCURRENCY = int(os.getenv("OCR_MAX_CONCURRENCY", "4"))
+OCR_MAX_CONNECTIONS = int(os.getenv("OCR_MAX_CONNECTIONS", str(OCR_MAX_CONCURRENCY)))
+OCR_REINTENTOS = int(os.getenv("OCR_REINTENTOS", "3"))
+
+# respuestas del servicio OCR cuando su cola está llena
+_STATUS_SATURADO = (429, 503)
+
+
+class OCRError(Exception):
+    """El servicio OCR no respondió correctamente."""
+
+
+_client = None
+_semaforo = None
+
+
+def _get_client() -> httpx.AsyncClient:
+    """Cliente HTTP persistente (keep-alive) compartido por todos los handlers."""
+    global _client, _semaforo
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(OCR_READ_TIMEOUT, connect=OCR_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=OCR_MAX_CONNECTIONS,
+                max_keepalive_connections=OCR_MAX_CONNECTIONS,
+            ),
+        )
+        _semaforo = asyncio.Semaphore(OCR_MAX_CONCURRENCY)
+    return _client
+
+
+async def procesar(contenido: bytes, file_name: str, mime_type: str, chat_id: int = None) -> dict:
+    """Envía un archivo al servicio OCR y devuelve el JSON extraído.
+
+    chat_id acompaña al archivo para que el servicio vincule su logs_ocr con la factura del chat.
+    """
+    client = _get_client()
+    for intento in range(OCR_REINTENTOS + 1):
+        # limita las llamadas en curso para no saturar ocr_ia
+        async with _semaforo:
+            try:
+                response = await client.post(
+                    OCR_URL, files={"file": (file_name, contenido, mime_type)}, data=_datos_chat(chat_id)
+                )
+            except httpx.TimeoutException as e:
+                raise OCRError("el servicio OCR tardó demasiado en responder") from e
+            except httpx.HTTPError as e:
+                raise OCRError(f"no se pudo contactar al servicio OCR ({e})") from e
+
+        if response.status_code not in _STATUS_SATURADO or intento == OCR_REINTENTOS:
+            break
+        # el servicio está saturado: esperar lo que indica y reintentar
+        await asyncio.sleep(_retry_after(response, intento))
+
+    if response.status_code != 200:
+        raise OCRError(f"el servicio OCR respondió {response.status_code}")
+    return response.json()
+
+
+def _datos_chat(chat_id):
+    return {"chat_id": str(chat_id)} if chat_id is not None else None
+
+
+async def procesar_lote(archivos, chat_id: int = None):
+    """Envía varios archivos (nombre, contenido, mime_type) en una sola solicitud.
+
+    Generador asíncrono: entrega (indice, resultado) a medida que el servicio
+    termina cada archivo; resultado es el JSON extraído o un OCRError con el
+    motivo de la falla de ese archivo.
+    """
+    client = _get_client()
+    files = [("file", (nombre, contenido, mime_type)) for nombre, contenido, mime_type in archivos]
+    for intento in range(OCR_REINTENTOS + 1):
+        async with _semaforo:
+            try:
+                async with client.stream("POST", OCR_BATCH_URL, files=files, data=_datos_chat(chat_id)) as response:
+                    if response.status_code in _STATUS_SATURADO and intento < OCR_REINTENTOS:
+                        espera = _retry_after(response, intento)
+                    elif response.status_code != 200:
+                        raise OCRError(f"el servicio OCR respondió {response.status_code}")
+                    else:
+                        async for linea in response.aiter_lines():
+                            if not linea.strip():
+                                continue
+                            item = json.loads(linea)
+                            if item["status"] == 200:
+                                yield item["indice"], item["resultado"]
+                            else:
+                                motivo = item["resultado"].get("error") or f"status {item['status']}"
+                                yield item["indice"], OCRError(motivo)
+                        return
+            except httpx.TimeoutException as e:
+                raise OCRError("el servicio OCR tardó demasiado en responder") from e
+            except httpx.HTTPError as e:
+                raise OCRError(f"no se pudo contactar al servicio OCR ({e})") from e
+        # el servicio está saturado: esperar lo que indica y reintentar
+        await asyncio.sleep(espera)
+
+
+def _retry_after(response: httpx.Response, intento: int) -> float:
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return 2.0 ** intento
+
+
+async def cerrar():
+    """Cierra las conexiones abiertas (se llama al apagar el bot)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
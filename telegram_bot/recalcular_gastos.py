@@ -0,0 +1,12 @@
+"""Reconstruye gastos_mensuales a partir de facturas (carga inicial o reparación).
+
+Uso: python recalcular_gastos.py
+"""
+import db
+import repositorio
+
+
+if __name__ == "__main__":
+    db.ejecutar(repositorio.recalcular_gastos_mensuales)
+    db.cerrar()
+    print("✅ gastos_mensuales recalculada.")
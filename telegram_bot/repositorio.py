@@ -0,0 +1,236 @@
+"""Queries del bot. Cada función recibe un cursor y se ejecuta con db.run().
+
+Todas las consultas de facturas y reportes se filtran por chat_id (tenant).
+Los reportes leen gastos_mensuales (mantenida por trigger en la base), así su
+costo depende de la cantidad de meses y no de la cantidad de facturas.
+"""
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+
+def upsert_proveedor(cursor, nombre):
+    cursor.execute("""
+        INSERT INTO proveedores (nombre)
+        VALUES (%s)
+        ON CONFLICT (nombre) DO UPDATE SET nombre = EXCLUDED.nombre
+        RETURNING id;
+    """, (nombre,))
+    return cursor.fetchone()[0]
+
+
+def existe_archivo(cursor, chat_id, archivo_hash):
+    """True si el chat ya cargó una factura desde exactamente el mismo archivo."""
+    cursor.execute("""
+        SELECT 1 FROM facturas WHERE chat_id = %s AND archivo_hash = %s;
+    """, (chat_id, archivo_hash))
+    return cursor.fetchone() is not None
+
+
+def archivos_existentes(cursor, chat_id, hashes):
+    """Subconjunto de hashes que el chat ya cargó."""
+    if not hashes:
+        return set()
+    cursor.execute("""
+        SELECT archivo_hash FROM facturas WHERE chat_id = %s AND archivo_hash = ANY(%s);
+    """, (chat_id, list(hashes)))
+    return {row[0] for row in cursor.fetchall()}
+
+
+def insertar_factura(cursor, chat_id, proveedor_id, fecha, total, categoria, raw_json, huella, archivo_hash):
+    """Inserta la factura; devuelve None si la huella o el archivo ya existían en el chat."""
+    cursor.execute("""
+        INSERT INTO facturas (chat_id, proveedor_id, fecha, total, categoria, raw_json, huella, archivo_hash)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT DO NOTHING
+        RETURNING id;
+    """, (chat_id, proveedor_id, fecha, total, categoria, raw_json, huella, archivo_hash))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def insertar_items(cursor, factura_id, items):
+    """Inserta todos los ítems en una sola sentencia."""
+    if not items:
+        return
+    execute_values(cursor, """
+        INSERT INTO items (factura_id, descripcion, precio_total)
+        VALUES %s;
+    """, [(factura_id, descripcion, precio) for descripcion, precio in items], page_size=1000)
+
+
+def guardar_factura(cursor, chat_id, proveedor, fecha, total, categoria, raw_json, items, huella, archivo_hash):
+    """Proveedor, factura e ítems en una única transacción.
+
+    Devuelve el id de la factura, o None si ya estaba registrada.
+    """
+    proveedor_id = upsert_proveedor(cursor, proveedor)
+    factura_id = insertar_factura(
+        cursor, chat_id, proveedor_id, fecha, total, categoria, raw_json, huella, archivo_hash
+    )
+    if factura_id is None:
+        return None
+    insertar_items(cursor, factura_id, items)
+    return factura_id
+
+
+def guardar_facturas(cursor, chat_id, facturas):
+    """Guarda un lote de facturas (ingesta.FacturaLeida) con una sentencia por tabla.
+
+    Devuelve el conjunto de archivo_hash efectivamente insertados; el resto ya
+    estaba registrado (misma huella o mismo archivo).
+    """
+    if not facturas:
+        return set()
+
+    nombres = sorted({f.proveedor for f in facturas})
+    filas = execute_values(cursor, """
+        INSERT INTO proveedores (nombre)
+        VALUES %s
+        ON CONFLICT (nombre) DO UPDATE SET nombre = EXCLUDED.nombre
+        RETURNING id, nombre;
+    """, [(n,) for n in nombres], page_size=1000, fetch=True)
+    proveedor_ids = {nombre: proveedor_id for proveedor_id, nombre in filas}
+
+    filas = execute_values(cursor, """
+        INSERT INTO facturas (chat_id, proveedor_id, fecha, total, categoria, raw_json, huella, archivo_hash)
+        VALUES %s
+        ON CONFLICT DO NOTHING
+        RETURNING id, archivo_hash;
+    """, [
+        (chat_id, proveedor_ids[f.proveedor], f.fecha, f.total, f.categoria, f.raw_json, f.huella, f.archivo_hash)
+        for f in facturas
+    ], page_size=1000, fetch=True)
+    factura_ids = {archivo_hash: factura_id for factura_id, archivo_hash in filas}
+
+    items = [
+        (factura_ids[f.archivo_hash], descripcion, precio)
+        for f in facturas if f.archivo_hash in factura_ids
+        for descripcion, precio in f.items
+    ]
+    if items:
+        execute_values(cursor, """
+            INSERT INTO items (factura_id, descripcion, precio_total)
+            VALUES %s;
+        """, items, page_size=1000)
+    return set(factura_ids)
+
+
+def gastos_por_proveedor(cursor, chat_id):
+    cursor.execute("""
+        SELECT p.nombre, SUM(g.total)
+        FROM gastos_mensuales g
+        JOIN proveedores p ON p.id = g.proveedor_id
+        WHERE g.chat_id = %s
+        GROUP BY p.nombre
+        ORDER BY SUM(g.total) DESC;
+    """, (chat_id,))
+    return cursor.fetchall()
+
+
+def totales_por_categoria(cursor, chat_id, desde, hasta):
+    """Totales por categoría de los meses en [desde, hasta) (desde = primer día de un mes)."""
+    cursor.execute("""
+        SELECT categoria, SUM(total)
+        FROM gastos_mensuales
+        WHERE chat_id = %s AND mes >= %s AND mes < %s
+        GROUP BY categoria
+        ORDER BY SUM(total) DESC;
+    """, (chat_id, desde, hasta))
+    return cursor.fetchall()
+
+
+def totales_por_mes(cursor, chat_id, desde, hasta):
+    """Totales por mes en [desde, hasta) (desde = primer día de un mes)."""
+    cursor.execute("""
+        SELECT EXTRACT(MONTH FROM mes) as mes, SUM(total)
+        FROM gastos_mensuales
+        WHERE chat_id = %s AND mes >= %s AND mes < %s
+        GROUP BY 1
+        ORDER BY 1;
+    """, (chat_id, desde, hasta))
+    return cursor.fetchall()
+
+
+def recalcular_gastos_mensuales(cursor):
+    cursor.execute("SELECT recalcular_gastos_mensuales();")
+
+
+# cola de ingesta
+
+def encolar_trabajo(cursor, chat_id, mensaje_id, nombre_archivo, mime_type, contenido):
+    cursor.execute("""
+        INSERT INTO trabajos_ingesta (chat_id, mensaje_id, nombre_archivo, mime_type, contenido)
+        VALUES (%s, %s, %s, %s, %s)
+        RETURNING id;
+    """, (chat_id, mensaje_id, nombre_archivo, mime_type, psycopg2.Binary(contenido)))
+    return cursor.fetchone()[0]
+
+
+def tomar_trabajo(cursor, lease_segundos):
+    """Reserva el trabajo pendiente más antiguo de un chat que no tenga otro en curso.
+
+    Un trabajo 'procesando' sin novedades durante lease_segundos (bot caído a mitad)
+    vuelve a estar disponible. Devuelve None si no hay trabajos.
+
+    Las reservas se serializan con un advisory lock de transacción: el UPDATE
+    corre con un snapshot tomado después de que la reserva anterior hizo commit,
+    así dos workers no toman a la vez dos trabajos del mismo chat (SKIP LOCKED
+    solo saltea la fila reservada, no las demás del chat).
+    """
+    cursor.execute("SELECT pg_advisory_xact_lock(hashtext('trabajos_ingesta'));")
+    cursor.execute("""
+        UPDATE trabajos_ingesta t
+        SET estado = 'procesando', intentos = t.intentos + 1, actualizado = NOW()
+        WHERE t.id = (
+            SELECT c.id
+            FROM trabajos_ingesta c
+            WHERE (
+                (c.estado = 'pendiente' AND c.disponible_desde <= NOW())
+                OR (c.estado = 'procesando' AND c.actualizado < NOW() - make_interval(secs => %s))
+            )
+            AND NOT EXISTS (
+                SELECT 1 FROM trabajos_ingesta p
+                WHERE p.chat_id = c.chat_id
+                  AND p.estado = 'procesando'
+                  AND p.id <> c.id
+                  AND p.actualizado >= NOW() - make_interval(secs => %s)
+            )
+            ORDER BY c.creado
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING t.id, t.chat_id, t.mensaje_id, t.nombre_archivo, t.mime_type, t.contenido, t.intentos;
+    """, (lease_segundos, lease_segundos))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    trabajo_id, chat_id, mensaje_id, nombre_archivo, mime_type, contenido, intentos = row
+    return {
+        "id": trabajo_id,
+        "chat_id": chat_id,
+        "mensaje_id": mensaje_id,
+        "nombre_archivo": nombre_archivo,
+        "mime_type": mime_type,
+        "contenido": bytes(contenido) if contenido is not None else b"",
+        "intentos": intentos,
+    }
+
+
+def reprogramar_trabajo(cursor, trabajo_id, espera_segundos, error):
+    cursor.execute("""
+        UPDATE trabajos_ingesta
+        SET estado = 'pendiente',
+            resultado = %s,
+            disponible_desde = NOW() + make_interval(secs => %s),
+            actualizado = NOW()
+        WHERE id = %s;
+    """, (error, espera_segundos, trabajo_id))
+
+
+def finalizar_trabajo(cursor, trabajo_id, estado, resultado):
+    cursor.execute("""
+        UPDATE trabajos_ingesta
+        SET estado = %s, resultado = %s, contenido = NULL, actualizado = NOW()
+        WHERE id = %s;
+    """, (estado, resultado, trabajo_id))